@@ -1,9 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, Cookie
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Cookie, Header, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 from app.config.database import get_db
-from app.schema.order_schema import OrderCreate, OrderOut
-from app.service.order_service import create_order, get_all_my_orders, get_order_by_id
+from app.schema.order_schema import OrderCreate, OrderOut, OrderPage, OrderBatchCreate, OrderBatchOut
+from app.service.idempotency_service import IdempotencyConflict
+from app.service.order_service import (
+    create_order,
+    create_order_idempotent,
+    create_orders_batch,
+    decode_cursor,
+    get_all_my_orders,
+    get_order_by_id,
+    stream_my_orders,
+)
+from app.util.reserve_stock_batch_remote import reserve_batch_endpoint
+
+NDJSON = "application/x-ndjson"
 
 router = APIRouter()
 
@@ -11,10 +24,21 @@ router = APIRouter()
 async def create_order_route(
     order_data: OrderCreate,
     access_token: str = Cookie(None),
-    db: Session = Depends(get_db)
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    db: AsyncSession = Depends(get_db)
 ):
     if not access_token:
         raise HTTPException(status_code=401, detail="Missing token")
+    # stock-service is down: 503 now instead of queueing pending orders nobody can reserve
+    reserve_batch_endpoint.breaker.raise_if_open()
+
+    if idempotency_key:
+        try:
+            stored = await create_order_idempotent(db, order_data, access_token, idempotency_key)
+        except IdempotencyConflict as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        headers = {"Idempotent-Replayed": "true"} if stored.replayed else None
+        return JSONResponse(status_code=stored.status_code, content=stored.body, headers=headers)
 
     result = await create_order(db, order_data, access_token)
 
@@ -23,21 +47,54 @@ async def create_order_route(
 
     return result
 
-@router.get("/order/me", response_model=List[OrderOut])
+@router.post("/order/batch", response_model=OrderBatchOut)
+async def create_orders_batch_route(
+    batch: OrderBatchCreate,
+    access_token: str = Cookie(None),
+    db: AsyncSession = Depends(get_db)
+):
+    if not access_token:
+        raise HTTPException(status_code=401, detail="Missing token")
+    reserve_batch_endpoint.breaker.raise_if_open()
+
+    result = await create_orders_batch(db, batch, access_token)
+    if "error" in result:
+        raise HTTPException(status_code=401, detail=result["error"])
+    return result
+
+@router.get("/order/me", response_model=OrderPage)
 async def get_all_my_orders_route(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None),
     access_token: str = Cookie(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if not access_token:
         raise HTTPException(status_code=401, detail="Missing token")
 
-    return await get_all_my_orders(db, access_token)
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Accept: application/x-ndjson -> stream everything after the cursor instead of one page
+    if NDJSON in request.headers.get("accept", ""):
+        rows = stream_my_orders(access_token, after)
+        if isinstance(rows, dict):
+            raise HTTPException(status_code=401, detail=rows["error"])
+        return StreamingResponse(rows, media_type=NDJSON)
+
+    result = await get_all_my_orders(db, access_token, limit, after)
+    if "error" in result:
+        raise HTTPException(status_code=401, detail=result["error"])
+    return result
 
 @router.get("/order/{order_id}", response_model=OrderOut)
 async def get_order_by_id_route(
     order_id: int,
     access_token: str = Cookie(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if not access_token:
         raise HTTPException(status_code=401, detail="Missing token")
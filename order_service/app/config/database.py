@@ -1,22 +1,48 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import declarative_base
 import os
 from dotenv import load_dotenv
+from app.config.sqlite_profile import CheckpointTask, RoutingSession, create_engines
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./db/default.db")
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+
+def _async_url(url: str) -> str:
+    """Swap a plain sqlite URL to the aiosqlite driver, keep explicit async URLs as they are."""
+    parsed = make_url(url)
+    if parsed.drivername in ("sqlite", "sqlite+pysqlite"):
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+    return parsed.render_as_string(hide_password=False)
+
+
+# engine is the (single) writer, reader_engine the read pool; reader_engine is None with SQLITE_PROFILE=plain
+engine, reader_engine = create_engines(_async_url(DATABASE_URL))
+SessionLocal = async_sessionmaker(
+    engine,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    writer=engine.sync_engine,
+    reader=reader_engine.sync_engine if reader_engine is not None else None,
+    autoflush=False,
+    expire_on_commit=False,
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+checkpoint_task = CheckpointTask(engine) if reader_engine is not None else None
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+def _create_schema(conn):
+    Base.metadata.create_all(conn)
+    # create_all only builds indexes together with new tables, add the missing ones to existing tables
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+async def init_db():
+    async with engine.begin() as conn:
+        await conn.run_sync(_create_schema)
+
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
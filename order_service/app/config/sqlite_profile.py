@@ -0,0 +1,135 @@
+# Each service image is built from its own directory (see compose.yaml), so this module is copied
+# into every service like the other shared utils. user_service/app/config/sqlite_profile.py is the
+# source: stock-service has a byte-identical copy, order_service an async variant whose pragmas,
+# settings and RoutingSession are the same. user_service/test/unit/sqlite_profile_test.py fails
+# when they drift, edit the source and copy the change over.
+import asyncio
+import logging
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# "production": WAL + tuned pragmas + reader pool / single writer, "plain": SQLite defaults, one pool
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "production").lower()
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+# negative = KiB, so -65536 is 64 MiB of page cache per connection
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))
+SQLITE_READER_POOL_SIZE = int(os.getenv("SQLITE_READER_POOL_SIZE", "4"))
+SQLITE_CHECKPOINT_INTERVAL = float(os.getenv("SQLITE_CHECKPOINT_INTERVAL", "60"))
+SQLITE_CHECKPOINT_MODE = os.getenv("SQLITE_CHECKPOINT_MODE", "PASSIVE").upper()
+
+
+def is_file_sqlite(url: str) -> bool:
+    """Reader/writer splitting only makes sense for a database file shared by several connections."""
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+
+def apply_pragmas(engine: Engine, query_only: bool = False) -> None:
+    """Set the profile's pragmas on every new DBAPI connection of the engine."""
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT}")
+        cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size = {SQLITE_CACHE_SIZE}")
+        cursor.execute("PRAGMA temp_store = MEMORY")
+        if query_only:
+            cursor.execute("PRAGMA query_only = ON")
+        cursor.close()
+
+
+def create_engines(url: str, profile: str = SQLITE_PROFILE) -> tuple[AsyncEngine, AsyncEngine | None]:
+    """Create (writer, reader) async engines for the URL.
+    With the production profile on a SQLite file the writer is a single serialized connection
+    and the reader a pool of query_only connections. Otherwise reader is None and the writer
+    engine is used for everything, exactly like before.
+    """
+    if profile != "production" or not is_file_sqlite(url):
+        return create_async_engine(url), None
+
+    # one connection: writers queue on the pool instead of failing with "database is locked"
+    writer = create_async_engine(url, pool_size=1, max_overflow=0, pool_timeout=30)
+    reader = create_async_engine(url, pool_size=SQLITE_READER_POOL_SIZE, max_overflow=0)
+    apply_pragmas(writer.sync_engine)
+    apply_pragmas(reader.sync_engine, query_only=True)
+    return writer, reader
+
+
+class RoutingSession(Session):
+    """Session that sends reads to the reader engine and writes to the writer engine.
+    Used as sync_session_class of AsyncSession, so writer and reader are the sync_engine of the async engines.
+
+    Once a transaction has written, all its further statements stay on the writer,
+    so it reads its own uncommitted changes. Without a reader it behaves like a plain Session.
+    """
+
+    def __init__(self, *args, writer: Engine | None = None, reader: Engine | None = None, **kw):
+        super().__init__(*args, **kw)
+        self._writer = writer
+        self._reader = reader
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._reader is None:
+            return self._writer or super().get_bind(mapper=mapper, clause=clause, **kw)
+        if self._flushing or getattr(clause, "is_dml", False) or self.info.get("wrote"):
+            self.info["wrote"] = True
+            return self._writer
+        return self._reader
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _reset_write_routing(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("wrote", None)
+
+
+class CheckpointTask:
+    """Background task running PRAGMA wal_checkpoint on the writer every SQLITE_CHECKPOINT_INTERVAL seconds,
+    so the WAL file does not keep growing while readers are busy."""
+
+    def __init__(self, engine: AsyncEngine, interval: float = SQLITE_CHECKPOINT_INTERVAL, mode: str = SQLITE_CHECKPOINT_MODE):
+        self.engine = engine
+        self.interval = interval
+        self.mode = mode
+        self._task: asyncio.Task | None = None
+        self.checkpoints = 0
+
+    def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run(), name="sqlite-checkpoint")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def checkpoint(self) -> tuple:
+        """Returns (busy, wal pages, checkpointed pages) as reported by SQLite."""
+        async with self.engine.connect() as conn:
+            result = tuple((await conn.exec_driver_sql(f"PRAGMA wal_checkpoint({self.mode})")).one())
+            await conn.commit()
+        self.checkpoints += 1
+        return result
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.checkpoint()
+            except Exception:
+                logger.exception("WAL checkpoint failed")
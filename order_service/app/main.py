@@ -1,25 +1,72 @@
-from fastapi import FastAPI
-from app.config.database import Base, engine
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from app.config.database import checkpoint_task, engine, init_db, reader_engine
 from app.api.v1.order_route import router as order_router
 from app.middleware.logger_middleware import logger_middleware
+from app.service.outbox_worker import outbox_worker
+from app.util.http_client import start_http_client, close_http_client
+from app.util.resilience import CircuitOpenError, stock_client_stats
+from app.util.availability_cache import availability_cache
+from app.util.token_cache import token_cache
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # DB init (SQLite tabuľky)
+    await init_db()
+    # One pooled HTTP client per worker for stock-service calls
+    await start_http_client()
+    # Drains stock reservations written by create_order
+    outbox_worker.start()
+    # Periodic WAL checkpoints (production SQLite profile only)
+    if checkpoint_task is not None:
+        checkpoint_task.start()
+    try:
+        yield
+    finally:
+        await outbox_worker.stop()
+        if checkpoint_task is not None:
+            await checkpoint_task.stop()
+        await close_http_client()
+        await engine.dispose()
+        if reader_engine is not None:
+            await reader_engine.dispose()
+
 
 app = FastAPI(
     title="Order Service API",
     description="A simple order management service",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
-# DB init (SQLite tabuľky)
-Base.metadata.create_all(bind=engine)
-
 # Middleware
 app.middleware("http")(logger_middleware)
 
+# Fail fast while the stock-service circuit breaker is open
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Stock service unavailable"},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+    )
+
 # Healthcheck pre Docker
 @app.get("/healthz")
 def healthz():
     return {"status": "ok"}
 
+# Cache counters for monitoring
+@app.get("/metrics")
+def metrics():
+    return {
+        "token_cache": token_cache.stats(),
+        "availability_cache": availability_cache.stats(),
+        "stock_client": stock_client_stats(),
+    }
+
 # Root (len info)
 @app.get("/")
 def root():
@@ -0,0 +1,16 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, DateTime, JSON
+from app.config.database import Base
+from datetime import datetime
+
+class IdempotencyRecord(Base):
+    """Stored response of a request sent with an Idempotency-Key. status_code is NULL while the first request runs,
+    expires_at is then only a short lease."""
+    __tablename__ = "idempotency_keys"
+
+    # "<user_id>:<Idempotency-Key>", keys are scoped per user
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    status_code: Mapped[int | None] = mapped_column(nullable=True)
+    response: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
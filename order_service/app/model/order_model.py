@@ -1,14 +1,40 @@
-from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import String, DateTime, JSON, func
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, DateTime, JSON, ForeignKey, Index, func
+from sqlalchemy.dialects import sqlite
 from app.config.database import Base
 from datetime import datetime
 
+# SQLite fills created_at with CURRENT_TIMESTAMP ("YYYY-MM-DD HH:MM:SS"). Bound parameters must use the
+# same text format, otherwise keyset comparisons on created_at disagree with the stored values.
+CreatedAt = DateTime().with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite",
+)
+
 class Order(Base):
     __tablename__ = "orders"
+    # Serves both user_id lookups and the (created_at, id) keyset cursor of /order/me
+    __table_args__ = (Index("ix_orders_user_created_id", "user_id", "created_at", "id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    user_id: Mapped[int] = mapped_column(nullable=False, index=True)
+    user_id: Mapped[int] = mapped_column(nullable=False)
     username: Mapped[str] = mapped_column(String, nullable=False)
-    items: Mapped[list] = mapped_column(JSON, nullable=False)
+    # Legacy JSON column, only kept as the source for the order_items backfill
+    legacy_items: Mapped[list] = mapped_column("items", JSON, nullable=False, default=list)
     status: Mapped[str] = mapped_column(String, nullable=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(CreatedAt, server_default=func.now(), nullable=False)
+
+    # Always load explicitly with selectinload(Order.items), lazy loading is not available on AsyncSession
+    items: Mapped[list["OrderLine"]] = relationship(
+        back_populates="order", cascade="all, delete-orphan", lazy="raise", order_by="OrderLine.item_id"
+    )
+
+
+class OrderLine(Base):
+    __tablename__ = "order_items"
+
+    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id", ondelete="CASCADE"), primary_key=True)
+    item_id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    amount: Mapped[int] = mapped_column(nullable=False)
+
+    order: Mapped[Order] = relationship(back_populates="items", lazy="raise")
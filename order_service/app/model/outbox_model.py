@@ -0,0 +1,21 @@
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, DateTime, JSON, ForeignKey, func
+from app.config.database import Base
+from app.model.order_model import Order
+from datetime import datetime
+
+class StockOutbox(Base):
+    """Stock reservation waiting to be sent to stock-service, written in the same transaction as its order."""
+    __tablename__ = "stock_outbox"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
+    # idempotency key for stock-service, a resent reservation is not decremented twice
+    reservation_id: Mapped[str] = mapped_column(String, nullable=False, unique=True)
+    items: Mapped[list] = mapped_column(JSON, nullable=False)
+    attempts: Mapped[int] = mapped_column(nullable=False, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    last_error: Mapped[str | None] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+
+    order: Mapped[Order] = relationship(lazy="raise")
@@ -1,14 +1,15 @@
 # app/schema/order_schema.py
 from pydantic import BaseModel, Field, AliasChoices, ConfigDict
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 class OrderItem(BaseModel):
     # prijme "id" aj historické "item_id"
     id: int = Field(validation_alias=AliasChoices("id", "item_id"))
     amount: int
     # ak by si niekde serializovala späť s "id", povolí populate_by_name
-    model_config = ConfigDict(populate_by_name=True)
+    # from_attributes: načíta sa aj priamo z riadkov order_items (item_id)
+    model_config = ConfigDict(populate_by_name=True, from_attributes=True)
 
 class OrderCreate(BaseModel):
     items: List[OrderItem]
@@ -22,3 +23,27 @@ class OrderOut(BaseModel):
     created_at: datetime
     # Pydantic v2: namiesto Config.orm_mode = True
     model_config = ConfigDict(from_attributes=True)
+
+class OrderPage(BaseModel):
+    items: List[OrderOut]
+    # nepriehľadný kurzor pre ďalšiu stránku, None = posledná stránka
+    next_cursor: Optional[str] = None
+
+MAX_BATCH_ORDERS = 500
+
+class OrderBatchCreate(BaseModel):
+    orders: List[OrderCreate] = Field(min_length=1, max_length=MAX_BATCH_ORDERS)
+
+class OrderBatchResult(BaseModel):
+    # index objednávky v požiadavke
+    index: int
+    success: bool
+    order_id: Optional[int] = None
+    status: Optional[str] = None
+    error: Optional[str] = None
+    missing: List[dict] = []
+
+class OrderBatchOut(BaseModel):
+    user_id: int
+    username: str
+    results: List[OrderBatchResult]
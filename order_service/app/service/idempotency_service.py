@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, NamedTuple
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from app.config.database import SessionLocal
+from app.model.idempotency_model import IdempotencyRecord
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+# lifetime of an in-progress row: if its worker dies mid-request the key frees up after this,
+# not after IDEMPOTENCY_TTL. Must outlast the slowest order request.
+IDEMPOTENCY_LEASE = float(os.getenv("IDEMPOTENCY_LEASE", "30"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+# how long a duplicate waits for the first request (possibly in another worker) to finish
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "10"))
+IDEMPOTENCY_POLL_INTERVAL = 0.05
+IDEMPOTENCY_PURGE_INTERVAL = 60.0
+
+
+class IdempotencyConflict(Exception):
+    """The key is reused with another payload, or its first request is still running after the wait timeout."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class StoredResponse(NamedTuple):
+    status_code: int
+    body: dict
+    request_hash: str
+    replayed: bool = False
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def request_hash(payload: dict) -> str:
+    """Stable digest of the request body, to detect a key reused for a different request."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Idempotency-Key handling: a TTL-evicted idempotency_keys table behind an in-process LRU.
+
+    Duplicates in the same worker queue on a per-key asyncio.Lock, duplicates in other
+    workers see the in-progress row and poll it until the first request stores its response.
+    """
+
+    def __init__(self, maxsize: int = IDEMPOTENCY_CACHE_SIZE, ttl: float = IDEMPOTENCY_TTL, lease: float = IDEMPOTENCY_LEASE):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lease = lease
+        self._cache: OrderedDict[str, tuple[datetime, StoredResponse]] = OrderedDict()
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._lock_users: dict[str, int] = {}
+        self._last_purge = datetime.min
+
+    def _cache_get(self, key: str) -> StoredResponse | None:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, stored = entry
+        if expires_at <= utcnow():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return stored
+
+    def _cache_put(self, key: str, expires_at: datetime, stored: StoredResponse) -> None:
+        self._cache[key] = (expires_at, stored)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    async def _claim(self, key: str, digest: str) -> StoredResponse | None:
+        """Insert the in-progress row with a short lease. Returns the stored response instead if the key
+        already completed. Expired rows count as free: completed ones past the TTL, and in-progress ones
+        whose worker died before _save or _release."""
+        deadline = utcnow() + timedelta(seconds=IDEMPOTENCY_WAIT_TIMEOUT)
+        while True:
+            async with SessionLocal() as db:
+                record = await db.get(IdempotencyRecord, key)
+                now = utcnow()
+                if record is not None and record.expires_at <= now:
+                    await db.delete(record)
+                    await db.commit()
+                    record = None
+                if record is None:
+                    db.add(IdempotencyRecord(
+                        key=key, request_hash=digest, expires_at=now + timedelta(seconds=self.lease)
+                    ))
+                    try:
+                        await db.commit()
+                        return None
+                    except IntegrityError:
+                        # another worker claimed it between our read and insert
+                        await db.rollback()
+                elif record.status_code is not None:
+                    stored = StoredResponse(record.status_code, record.response, record.request_hash, True)
+                    self._cache_put(key, record.expires_at, stored)
+                    return stored
+            if utcnow() >= deadline:
+                raise IdempotencyConflict(409, "A request with this Idempotency-Key is still in progress")
+            await asyncio.sleep(IDEMPOTENCY_POLL_INTERVAL)
+
+    async def _release(self, key: str) -> None:
+        async with SessionLocal() as db:
+            await db.execute(
+                delete(IdempotencyRecord).where(IdempotencyRecord.key == key, IdempotencyRecord.status_code.is_(None))
+            )
+            await db.commit()
+
+    async def _save(self, key: str, stored: StoredResponse) -> None:
+        # the full TTL starts only once there is a response to replay
+        expires_at = utcnow() + timedelta(seconds=self.ttl)
+        async with SessionLocal() as db:
+            await db.execute(
+                update(IdempotencyRecord)
+                .where(IdempotencyRecord.key == key)
+                .values(status_code=stored.status_code, response=stored.body, expires_at=expires_at)
+            )
+            await db.commit()
+        self._cache_put(key, expires_at, stored._replace(replayed=True))
+
+    async def purge_expired(self) -> None:
+        """Delete expired rows, at most once per IDEMPOTENCY_PURGE_INTERVAL."""
+        now = utcnow()
+        if (now - self._last_purge).total_seconds() < IDEMPOTENCY_PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        async with SessionLocal() as db:
+            await db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.expires_at <= now))
+            await db.commit()
+
+    async def run(
+        self,
+        key: str,
+        digest: str,
+        handler: Callable[[], Awaitable[tuple[int, dict]]],
+    ) -> StoredResponse:
+        """Run handler once per key and replay its (status_code, body) for every duplicate.
+        If the handler raises, the key is released so the client can retry."""
+        stored = self._cache_get(key)
+        if stored is None:
+            lock = self._locks.setdefault(key, asyncio.Lock())
+            self._lock_users[key] = self._lock_users.get(key, 0) + 1
+            try:
+                async with lock:
+                    stored = self._cache_get(key) or await self._claim(key, digest)
+                    if stored is None:
+                        try:
+                            status_code, body = await handler()
+                        except BaseException:
+                            await self._release(key)
+                            raise
+                        stored = StoredResponse(status_code, body, digest)
+                        await self._save(key, stored)
+            finally:
+                self._lock_users[key] -= 1
+                if not self._lock_users[key]:
+                    del self._lock_users[key]
+                    del self._locks[key]
+            await self.purge_expired()
+
+        if stored.request_hash != digest:
+            raise IdempotencyConflict(422, "Idempotency-Key was already used with a different request")
+        return stored
+
+
+idempotency_store = IdempotencyStore()
@@ -1,72 +1,206 @@
-from sqlalchemy.orm import Session
-from app.model.order_model import Order
-from app.schema.order_schema import OrderCreate
-from app.util.check_stock_remote import check_stock_remote
+import base64
+import json
+from datetime import datetime
+from typing import AsyncIterator
+from sqlalchemy import literal, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.config.database import SessionLocal
+from app.model.order_model import Order, OrderLine
+from app.schema.order_schema import OrderCreate, OrderOut, OrderBatchCreate
+from app.service.idempotency_service import StoredResponse, idempotency_store, request_hash
+from app.service.outbox_worker import new_outbox_entry, outbox_worker
+from app.util.availability_cache import availability_cache
 from app.util.fetch_user import get_username_from_token
-from app.util.decrease_stock_remote import decrease_stock_remote
 
 
-async def get_all_my_orders(db: Session, token: str):
-    """Get all orders for the current user"""
+STREAM_BATCH_SIZE = 500
+
+
+def encode_cursor(created_at: datetime, order_id: int) -> str:
+    """Encode the (created_at, id) position of the last returned order into an opaque cursor."""
+    raw = json.dumps([created_at.isoformat(), order_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor. Raises ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, order_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(order_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _my_orders_query(user_id: int, after: tuple[datetime, int] | None):
+    """Newest-first orders of a user, optionally starting after a cursor position."""
+    query = select(Order).options(selectinload(Order.items)).where(Order.user_id == user_id)
+    if after is not None:
+        created_at, order_id = after
+        query = query.where(
+            tuple_(Order.created_at, Order.id) < tuple_(literal(created_at, Order.created_at.type), order_id)
+        )
+    return query.order_by(Order.created_at.desc(), Order.id.desc())
+
+
+async def get_all_my_orders(db: AsyncSession, token: str, limit: int = 50, after: tuple[datetime, int] | None = None):
+    """Get one page of orders for the current user, newest first.
+    Returns the page items and a next_cursor, which is None on the last page.
+    """
+    user = get_username_from_token(token)
+    if not user or not user["user_id"]:
+        return {"error": "Invalid or expired token"}
+
+    result = await db.execute(_my_orders_query(user["user_id"], after).limit(limit + 1))
+    orders = list(result.scalars().all())
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = encode_cursor(orders[-1].created_at, orders[-1].id)
+    return {"items": orders, "next_cursor": next_cursor}
+
+
+def stream_my_orders(token: str, after: tuple[datetime, int] | None = None) -> AsyncIterator[str] | dict:
+    """Stream all orders of the current user as NDJSON lines from a server-side cursor.
+    The token is checked up front; the generator opens its own session so it outlives the request scope.
+    """
     user = get_username_from_token(token)
     if not user or not user["user_id"]:
         return {"error": "Invalid or expired token"}
 
-    orders = db.query(Order).filter(Order.user_id == user["user_id"]).all()
-    return orders
+    async def rows() -> AsyncIterator[str]:
+        async with SessionLocal() as session:
+            query = _my_orders_query(user["user_id"], after).execution_options(yield_per=STREAM_BATCH_SIZE)
+            result = await session.stream(query)
+            async for order in result.scalars():
+                yield OrderOut.model_validate(order).model_dump_json() + "\n"
+
+    return rows()
+
+
+def requested_amounts(order_data: OrderCreate) -> dict[int, int]:
+    """Sum the requested amount per item id."""
+    amounts: dict[int, int] = {}
+    for it in order_data.items:
+        amounts[it.id] = amounts.get(it.id, 0) + it.amount
+    return amounts
+
+
+def build_order_lines(order_data: OrderCreate) -> list[OrderLine]:
+    """Turn the requested items into order_items rows, one row per item id."""
+    return [OrderLine(item_id=item_id, amount=amount) for item_id, amount in requested_amounts(order_data).items()]
 
 
-async def create_order(db: Session, order_data: OrderCreate, token: str):
-    """Create a new order and decrease stock in stock-service."""
+async def create_order(db: AsyncSession, order_data: OrderCreate, token: str):
+    """Create a new pending order together with its stock outbox entry.
+    Stock is reserved asynchronously by the outbox worker, which then marks the order created or failed.
+    """
     user = get_username_from_token(token)
     if not user or not user["user_id"]:
         return {"error": "Invalid or expired token"}
+    if not order_data.items:
+        return {"error": "Order has no items"}
 
     # Posielame rovno id (Pydantic aliasy v stock-service zvládnu aj item_id)
     items = [{"id": it.id, "amount": it.amount} for it in order_data.items]
 
-    # Najprv overíme dostupnosť v stock-service
-    try:
-        stock_response = await check_stock_remote(items)
-    except Exception as e:
-        return {"error": f"Stock service nedostupný: {str(e)}"}
-
-    if not stock_response["available"]:
-        return stock_response
+    # položky, o ktorých vieme, že ich je málo, odmietneme hneď, bez objednávky a bez volania skladu
+    missing = availability_cache.shortfall(requested_amounts(order_data))
+    if missing:
+        return {"available": False, "error": "Insufficient stock", "missing": missing}
 
-    # Vytvoríme objednávku v DB
+    # Objednávka aj outbox v jednej lokálnej transakcii, bez čakania na stock-service
     order = Order(
         user_id=user["user_id"],
         username=user["username"],
-        items=[item.model_dump() for item in order_data.items],
-        status="created"
+        items=build_order_lines(order_data),
+        status="pending"
     )
-    db.add(order)
-
-    # Znížime stav zásob
-    decrease_result = await decrease_stock_remote(items)
-    if not decrease_result.get("success"):
-        db.rollback()
-        return {"error": "Failed to decrease stock!"}
-
-    db.commit()
-    db.refresh(order)
+    db.add_all([order, new_outbox_entry(order, items)])
+    await db.commit()
+    outbox_worker.wake()
 
     return {
         "success": True,
         "order_id": order.id,
+        "status": order.status,
         "user_id": user["user_id"],
         "username": user["username"]
     }
 
 
-async def get_order_by_id(db: Session, order_id: int, token: str):
+async def create_order_idempotent(
+    db: AsyncSession, order_data: OrderCreate, token: str, idempotency_key: str
+) -> StoredResponse:
+    """create_order behind an Idempotency-Key: the first request runs, duplicates
+    (also concurrent ones) get its stored status code and body back."""
+    async def handler() -> tuple[int, dict]:
+        result = await create_order(db, order_data, token)
+        if "error" in result or (result.get("available") == False):
+            return 400, {"detail": result}
+        return 200, result
+
+    user = get_username_from_token(token)
+    if not user or not user["user_id"]:
+        status_code, body = await handler()
+        return StoredResponse(status_code, body, "")
+
+    return await idempotency_store.run(
+        f"{user['user_id']}:{idempotency_key}",
+        request_hash(order_data.model_dump()),
+        handler,
+    )
+
+
+async def create_orders_batch(db: AsyncSession, batch: OrderBatchCreate, token: str):
+    """Create many pending orders at once: one token decode and one transaction for all
+    orders and their outbox entries. The outbox worker reserves their stock in grouped calls.
+    Orders are validated one by one, an invalid order does not affect the others.
+    """
+    user = get_username_from_token(token)
+    if not user or not user["user_id"]:
+        return {"error": "Invalid or expired token"}
+
+    results: list[dict] = [{"index": i, "success": False} for i in range(len(batch.orders))]
+    orders: dict[int, Order] = {}
+    for i, order_data in enumerate(batch.orders):
+        if not order_data.items:
+            results[i]["error"] = "Order has no items"
+            continue
+        missing = availability_cache.shortfall(requested_amounts(order_data))
+        if missing:
+            results[i]["error"] = "Insufficient stock"
+            results[i]["missing"] = missing
+            continue
+        order = Order(
+            user_id=user["user_id"],
+            username=user["username"],
+            items=build_order_lines(order_data),
+            status="pending"
+        )
+        orders[i] = order
+        db.add_all([order, new_outbox_entry(order, [{"id": it.id, "amount": it.amount} for it in order_data.items])])
+
+    if orders:
+        await db.commit()
+        outbox_worker.wake()
+        for i, order in orders.items():
+            results[i]["success"] = True
+            results[i]["order_id"] = order.id
+            results[i]["status"] = order.status
+
+    return {"user_id": user["user_id"], "username": user["username"], "results": results}
+
+
+async def get_order_by_id(db: AsyncSession, order_id: int, token: str):
     """Retrieve a single order by its ID for the authenticated user."""
     user = get_username_from_token(token)
     if not user or not user["user_id"]:
         return {"error": "Invalid or expired token"}
 
-    order = db.query(Order).filter(Order.id == order_id).first()
+    result = await db.execute(select(Order).options(selectinload(Order.items)).where(Order.id == order_id))
+    order = result.scalars().first()
     if not order:
         return {"error": "Order not found"}
     return order
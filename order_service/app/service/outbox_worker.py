@@ -0,0 +1,202 @@
+import asyncio
+import os
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, select, update
+from app.config.database import SessionLocal
+from app.model.order_model import Order
+from app.model.outbox_model import StockOutbox
+from app.util.availability_cache import availability_cache
+from app.util.logger import get_logger
+from app.util.reserve_stock_batch_remote import reserve_stock_batch_remote
+from app.util.resilience import CircuitOpenError
+
+logger = get_logger()
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1.0"))
+OUTBOX_BASE_BACKOFF = float(os.getenv("OUTBOX_BASE_BACKOFF", "0.5"))
+OUTBOX_MAX_BACKOFF = float(os.getenv("OUTBOX_MAX_BACKOFF", "60"))
+# after this many transport errors the order shows "stock_unknown", its row keeps retrying
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "20"))
+# how long a claimed batch is hidden from other workers while its stock call is in flight
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "30"))
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def new_outbox_entry(order: Order, items: list[dict]) -> StockOutbox:
+    """Outbox row for a new order, due immediately. Add it in the same session as the order."""
+    return StockOutbox(
+        order=order,
+        reservation_id=uuid.uuid4().hex,
+        items=items,
+        attempts=0,
+        next_attempt_at=utcnow(),
+    )
+
+
+def backoff_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, capped at OUTBOX_MAX_BACKOFF."""
+    # the exponent is capped too, rows retry forever and 2 ** attempts would overflow a float
+    delay = min(OUTBOX_MAX_BACKOFF, OUTBOX_BASE_BACKOFF * 2 ** min(max(attempts - 1, 0), 32))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class OutboxWorker:
+    """Background task that drains stock_outbox to stock-service in batches.
+
+    Accepted reservations move their order to "created", rejected ones are
+    compensated by marking the order "failed". Network errors are retried
+    with capped backoff until stock-service answers; after OUTBOX_MAX_ATTEMPTS
+    the order is shown as "stock_unknown" until then.
+    """
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="stock-outbox-worker")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+    def wake(self) -> None:
+        """Ask for an immediate drain, called after an order with outbox rows commits."""
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                processed = await self.drain_once()
+            except Exception:
+                logger.exception("Outbox drain failed")
+                processed = 0
+            if processed >= OUTBOX_BATCH_SIZE:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _claim_batch(self) -> list:
+        """Lease due rows by pushing next_attempt_at forward, so other workers skip them."""
+        now = utcnow()
+        async with SessionLocal() as db:
+            due_ids = (await db.execute(
+                select(StockOutbox.id)
+                .where(StockOutbox.next_attempt_at <= now)
+                .order_by(StockOutbox.id)
+                .limit(OUTBOX_BATCH_SIZE)
+            )).scalars().all()
+            if not due_ids:
+                return []
+            claimed = (await db.execute(
+                update(StockOutbox)
+                .where(StockOutbox.id.in_(due_ids), StockOutbox.next_attempt_at <= now)
+                .values(next_attempt_at=now + timedelta(seconds=OUTBOX_LEASE_SECONDS))
+                .returning(
+                    StockOutbox.id,
+                    StockOutbox.order_id,
+                    StockOutbox.reservation_id,
+                    StockOutbox.items,
+                    StockOutbox.attempts,
+                )
+            )).all()
+            await db.commit()
+        return sorted(claimed, key=lambda row: row.id)
+
+    async def drain_once(self) -> int:
+        """Send one batch of due reservations. Returns how many outbox rows were handled."""
+        batch = await self._claim_batch()
+        if not batch:
+            return 0
+
+        try:
+            response = await reserve_stock_batch_remote([
+                {"reservation_id": row.reservation_id, "items": row.items} for row in batch
+            ])
+            results = response["results"]
+            if len(results) != len(batch):
+                # results are matched to rows by position, a short answer is not trusted
+                raise ValueError(f"stock-service returned {len(results)} results for {len(batch)} reservations")
+        except CircuitOpenError as e:
+            # stock-service is known to be down, wait for the breaker without spending attempts
+            await self._defer(batch, e.retry_after)
+            return 0
+        except Exception as e:
+            await self._retry_later(batch, str(e))
+            return len(batch)
+
+        created, failed = [], []
+        for row, result in zip(batch, results, strict=True):
+            if result["success"]:
+                created.append(row.order_id)
+                availability_cache.invalidate(item["id"] for item in row.items)
+            else:
+                failed.append(row.order_id)
+                for missing in result["missing"]:
+                    availability_cache.put(missing["id"], missing["available"])
+                logger.info(f"Order {row.order_id} failed, insufficient stock: {result['missing']}")
+
+        async with SessionLocal() as db:
+            if created:
+                await db.execute(update(Order).where(Order.id.in_(created)).values(status="created"))
+            if failed:
+                await db.execute(update(Order).where(Order.id.in_(failed)).values(status="failed"))
+            await db.execute(delete(StockOutbox).where(StockOutbox.id.in_([row.id for row in batch])))
+            await db.commit()
+        return len(batch)
+
+    async def _defer(self, batch: list, seconds: float) -> None:
+        """Push a batch back by the given delay without counting an attempt."""
+        next_attempt_at = utcnow() + timedelta(seconds=max(seconds, OUTBOX_POLL_INTERVAL))
+        async with SessionLocal() as db:
+            await db.execute(
+                update(StockOutbox)
+                .where(StockOutbox.id.in_([row.id for row in batch]))
+                .values(next_attempt_at=next_attempt_at)
+            )
+            await db.commit()
+
+    async def _retry_later(self, batch: list, error: str) -> None:
+        """Reschedule a batch after a transport error. Rows are never dropped: the reservation
+        is idempotent on reservation_id, so retrying is always safe, while giving up could leak
+        stock that stock-service applied but never confirmed."""
+        logger.info(f"Stock reservation for {len(batch)} orders failed, retrying later: {error}")
+        now = utcnow()
+        unknown = [row.order_id for row in batch if row.attempts + 1 >= OUTBOX_MAX_ATTEMPTS]
+        async with SessionLocal() as db:
+            for row in batch:
+                await db.execute(
+                    update(StockOutbox)
+                    .where(StockOutbox.id == row.id)
+                    .values(
+                        attempts=row.attempts + 1,
+                        next_attempt_at=now + timedelta(seconds=backoff_delay(row.attempts + 1)),
+                        last_error=error[:500],
+                    )
+                )
+            if unknown:
+                # not "failed": the reservation may have been applied with only the answer lost.
+                # The row keeps retrying at OUTBOX_MAX_BACKOFF and settles the order either way.
+                logger.warning(f"Orders {unknown} still unconfirmed after {OUTBOX_MAX_ATTEMPTS} attempts")
+                await db.execute(
+                    update(Order).where(Order.id.in_(unknown), Order.status == "pending").values(status="stock_unknown")
+                )
+            await db.commit()
+
+outbox_worker = OutboxWorker()
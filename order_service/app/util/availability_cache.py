@@ -0,0 +1,101 @@
+import os
+import time
+from collections import OrderedDict
+
+AVAILABILITY_CACHE_TTL = float(os.getenv("AVAILABILITY_CACHE_TTL", "2"))
+# confirmed out-of-stock items (available == 0) stay cached a little longer
+AVAILABILITY_NEGATIVE_TTL = float(os.getenv("AVAILABILITY_NEGATIVE_TTL", "5"))
+AVAILABILITY_CACHE_SIZE = int(os.getenv("AVAILABILITY_CACHE_SIZE", "10000"))
+
+
+class AvailabilityCache:
+    """Short-TTL cache of the last known available amount per stock item id.
+
+    Filled from the shortfalls stock-service reports when a reservation fails, and
+    used to reject orders that ask for more than is known to be left, without a
+    network call or an order row. A successful reservation of an item drops its entry.
+    Only used from the event loop, so no locking.
+    """
+
+    def __init__(
+        self,
+        ttl: float = AVAILABILITY_CACHE_TTL,
+        negative_ttl: float = AVAILABILITY_NEGATIVE_TTL,
+        maxsize: int = AVAILABILITY_CACHE_SIZE,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        # item_id -> (stored_at, expires_at, available)
+        self._entries: OrderedDict[int, tuple[float, float, int]] = OrderedDict()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.invalidated = 0
+        self._hit_age_total = 0.0
+        self._hit_age_max = 0.0
+
+    def put(self, item_id: int, available: int) -> None:
+        if self.maxsize <= 0:
+            return
+        now = time.monotonic()
+        ttl = self.negative_ttl if available <= 0 else self.ttl
+        self._entries[item_id] = (now, now + ttl, max(available, 0))
+        self._entries.move_to_end(item_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, item_ids) -> None:
+        for item_id in item_ids:
+            if self._entries.pop(item_id, None) is not None:
+                self.invalidated += 1
+
+    def shortfall(self, requested: dict[int, int]) -> list[dict]:
+        """Lines that ask for more than the cached available amount, in the /stock/check "missing" format.
+        An empty list means the order may go ahead, not that stock is guaranteed."""
+        now = time.monotonic()
+        missing = []
+        for item_id, amount in requested.items():
+            entry = self._entries.get(item_id)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[item_id]
+                self.misses += 1
+                continue
+            stored_at, _, available = entry
+            self.hits += 1
+            if available == 0:
+                self.negative_hits += 1
+            age = now - stored_at
+            self._hit_age_total += age
+            self._hit_age_max = max(self._hit_age_max, age)
+            if amount > available:
+                missing.append({"id": item_id, "requested": amount, "available": available})
+        if missing:
+            self.rejected += 1
+        return missing
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "negative_ttl": self.negative_ttl,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "rejected_orders": self.rejected,
+            "invalidated": self.invalidated,
+            # how old the cached amounts were when they were used
+            "avg_hit_age_ms": round(self._hit_age_total / self.hits * 1000, 2) if self.hits else 0.0,
+            "max_hit_age_ms": round(self._hit_age_max * 1000, 2),
+        }
+
+
+availability_cache = AvailabilityCache()
@@ -0,0 +1,56 @@
+"""One-off migration: copy the legacy JSON ``orders.items`` into the ``order_items`` table.
+
+Run from the order_service directory (safe to re-run, orders that already have rows are skipped):
+    python -m app.util.backfill_order_items [batch_size]
+"""
+import asyncio
+import sys
+from sqlalchemy import exists, insert, select
+from app.config.database import SessionLocal, engine, init_db
+from app.model.order_model import Order, OrderLine
+
+
+def legacy_lines(order_id: int, legacy_items: list) -> list[dict]:
+    """Convert one legacy JSON item list (entries with "id" or "item_id") into order_items rows."""
+    amounts: dict[int, int] = {}
+    for it in legacy_items or []:
+        item_id = it.get("id", it.get("item_id"))
+        if item_id is None:
+            continue
+        amounts[int(item_id)] = amounts.get(int(item_id), 0) + int(it.get("amount", 0))
+    return [{"order_id": order_id, "item_id": item_id, "amount": amount} for item_id, amount in amounts.items()]
+
+
+async def backfill(batch_size: int = 1000) -> int:
+    """Backfill order_items in id-ordered batches, one transaction per batch. Returns the number of orders migrated."""
+    await init_db()
+    migrated = 0
+    last_id = 0
+    while True:
+        async with SessionLocal() as db:
+            result = await db.execute(
+                select(Order.id, Order.legacy_items)
+                .where(Order.id > last_id)
+                .where(~exists().where(OrderLine.order_id == Order.id))
+                .order_by(Order.id)
+                .limit(batch_size)
+            )
+            batch = result.all()
+            if not batch:
+                break
+
+            rows = [row for order_id, legacy_items in batch for row in legacy_lines(order_id, legacy_items)]
+            if rows:
+                await db.execute(insert(OrderLine), rows)
+            await db.commit()
+
+        migrated += len(batch)
+        last_id = batch[-1][0]
+        print(f"Backfilled {migrated} orders (last id {last_id})")
+
+    await engine.dispose()
+    return migrated
+
+
+if __name__ == "__main__":
+    asyncio.run(backfill(int(sys.argv[1]) if len(sys.argv) > 1 else 1000))
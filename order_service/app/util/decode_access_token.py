@@ -1,6 +1,7 @@
 import os
 import jwt
 from dotenv import load_dotenv
+from app.util.token_cache import token_cache
 
 load_dotenv()
 
@@ -12,12 +13,19 @@ def decode_access_token(token: str) -> dict | None:
     if not token or not SECRET_KEY:
         return None
 
+    # Verified claims are cached until the token's exp
+    cached = token_cache.get(token)
+    if cached is not None:
+        return dict(cached)
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return {
+        claims = {
             "user_id": payload.get('user_id'),
             "username": payload.get('sub')
         }
+        token_cache.put(token, claims, payload.get('exp'))
+        return dict(claims)
     except jwt.ExpiredSignatureError:
         print("❌ Token has expired")
         return None
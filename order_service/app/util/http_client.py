@@ -0,0 +1,50 @@
+import os
+import httpx
+
+STOCK_HTTP_MAX_CONNECTIONS = int(os.getenv("STOCK_HTTP_MAX_CONNECTIONS", "100"))
+STOCK_HTTP_MAX_KEEPALIVE = int(os.getenv("STOCK_HTTP_MAX_KEEPALIVE", "20"))
+STOCK_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("STOCK_HTTP_KEEPALIVE_EXPIRY", "30"))
+STOCK_HTTP_CONNECT_TIMEOUT = float(os.getenv("STOCK_HTTP_CONNECT_TIMEOUT", "2"))
+STOCK_HTTP_READ_TIMEOUT = float(os.getenv("STOCK_HTTP_READ_TIMEOUT", "5"))
+# HTTP/2 needs the optional "h2" package (pip install "httpx[http2]")
+STOCK_HTTP2 = os.getenv("STOCK_HTTP2", "false").lower() in ("1", "true", "yes")
+
+_client: httpx.AsyncClient | None = None
+
+
+def stock_timeout(connect: float | None = None, read: float | None = None) -> httpx.Timeout:
+    """Build a per-call timeout, falling back to the configured defaults."""
+    connect = STOCK_HTTP_CONNECT_TIMEOUT if connect is None else connect
+    read = STOCK_HTTP_READ_TIMEOUT if read is None else read
+    return httpx.Timeout(connect=connect, read=read, write=read, pool=connect)
+
+
+async def start_http_client() -> httpx.AsyncClient:
+    """Create the shared client for this worker. Called once from the app lifespan."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            http2=STOCK_HTTP2,
+            timeout=stock_timeout(),
+            limits=httpx.Limits(
+                max_connections=STOCK_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=STOCK_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=STOCK_HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared client and release its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client. Raises if the app lifespan has not started it."""
+    if _client is None:
+        raise RuntimeError("HTTP client is not started, run the app with its lifespan")
+    return _client
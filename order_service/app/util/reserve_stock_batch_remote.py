@@ -0,0 +1,20 @@
+import httpx
+import os
+from app.util.http_client import get_http_client
+from app.util.resilience import StockEndpoint
+
+STOCK_SERVICE_RESERVE_BATCH = os.getenv(
+    "STOCK_SERVICE_RESERVE_BATCH",
+    "http://localhost:9990/api/v1/stock/reserve/batch"
+)
+STOCK_DEADLINE_RESERVE_BATCH = float(os.getenv("STOCK_DEADLINE_RESERVE_BATCH", "15"))
+# retried after read timeouts too, stock-service dedupes by reservation_id
+reserve_batch_endpoint = StockEndpoint("reserve_batch", deadline=STOCK_DEADLINE_RESERVE_BATCH, idempotent=True)
+
+async def reserve_stock_batch_remote(orders: list[dict], timeout: httpx.Timeout | None = None) -> dict:
+    """orders: [{"items": [...], "reservation_id": "..."}], results come back in the same order."""
+    client = get_http_client()
+    return await reserve_batch_endpoint.call(
+        lambda t: client.post(STOCK_SERVICE_RESERVE_BATCH, json={"orders": orders}, timeout=t),
+        timeout,
+    )
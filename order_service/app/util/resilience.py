@@ -0,0 +1,250 @@
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable
+import httpx
+from app.util.http_client import stock_timeout
+
+STOCK_BREAKER_FAILURES = int(os.getenv("STOCK_BREAKER_FAILURES", "5"))
+STOCK_BREAKER_RESET_TIMEOUT = float(os.getenv("STOCK_BREAKER_RESET_TIMEOUT", "30"))
+STOCK_BREAKER_HALF_OPEN_CALLS = int(os.getenv("STOCK_BREAKER_HALF_OPEN_CALLS", "1"))
+# retries may add at most this fraction on top of first attempts (plus a small floor per second)
+STOCK_RETRY_RATIO = float(os.getenv("STOCK_RETRY_RATIO", "0.1"))
+STOCK_RETRY_MIN_PER_SEC = float(os.getenv("STOCK_RETRY_MIN_PER_SEC", "1"))
+STOCK_RETRY_WINDOW = float(os.getenv("STOCK_RETRY_WINDOW", "10"))
+STOCK_MAX_RETRIES = int(os.getenv("STOCK_MAX_RETRIES", "2"))
+
+# transport errors raised before the request reached stock-service, always safe to retry
+_NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling stock-service while the endpoint's breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit for stock endpoint '{name}' is open")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures, open -> half-open after the reset timeout,
+    half-open -> closed on a successful probe or back to open on a failed one."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = STOCK_BREAKER_FAILURES,
+        reset_timeout: float = STOCK_BREAKER_RESET_TIMEOUT,
+        half_open_max_calls: int = STOCK_BREAKER_HALF_OPEN_CALLS,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self.trips = 0
+        self.rejected = 0
+        self.failures = 0
+        self.successes = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+    def retry_after(self) -> float:
+        return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def acquire(self) -> None:
+        """Allow a call or raise CircuitOpenError. In half-open only a few probes get through."""
+        state = self.state
+        if state == self.OPEN or (state == self.HALF_OPEN and self._half_open_calls >= self.half_open_max_calls):
+            self.rejected += 1
+            raise CircuitOpenError(self.name, self.retry_after() if state == self.OPEN else 1.0)
+        if state == self.HALF_OPEN:
+            self._half_open_calls += 1
+
+    def raise_if_open(self) -> None:
+        """Fail fast while open, for callers that only depend on the endpoint indirectly.
+        Takes no half-open probe slot, the real calls still decide when the breaker closes."""
+        if self.state == self.OPEN:
+            self.rejected += 1
+            raise CircuitOpenError(self.name, self.retry_after())
+
+    def release(self) -> None:
+        """Hand back a half-open probe slot after a call that proved nothing either way."""
+        if self._state == self.HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    def record_success(self) -> None:
+        self.successes += 1
+        self._consecutive_failures = 0
+        if self._state != self.CLOSED:
+            self._state = self.CLOSED
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._consecutive_failures += 1
+        if self._state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.trips += 1
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "trips": self.trips,
+            "consecutive_failures": self._consecutive_failures,
+            "failures": self.failures,
+            "successes": self.successes,
+            "rejected": self.rejected,
+        }
+
+
+class RetryBudget:
+    """Caps retries to a fraction of recent first attempts, so retries cannot multiply load on an outage."""
+
+    def __init__(
+        self,
+        ratio: float = STOCK_RETRY_RATIO,
+        min_per_sec: float = STOCK_RETRY_MIN_PER_SEC,
+        window: float = STOCK_RETRY_WINDOW,
+    ):
+        self.ratio = ratio
+        self.min_per_sec = min_per_sec
+        self.window = window
+        self._requests: deque[float] = deque()
+        self._retries: deque[float] = deque()
+        self.exhausted = 0
+
+    def _prune(self, now: float) -> None:
+        cutoff = now - self.window
+        for events in (self._requests, self._retries):
+            while events and events[0] < cutoff:
+                events.popleft()
+
+    def record_request(self) -> None:
+        self._requests.append(time.monotonic())
+
+    def try_retry(self) -> bool:
+        now = time.monotonic()
+        self._prune(now)
+        allowed = self.min_per_sec * self.window + self.ratio * len(self._requests)
+        if len(self._retries) >= allowed:
+            self.exhausted += 1
+            return False
+        self._retries.append(now)
+        return True
+
+    def stats(self) -> dict:
+        self._prune(time.monotonic())
+        return {
+            "requests": len(self._requests),
+            "retries": len(self._retries),
+            "exhausted": self.exhausted,
+            "ratio": self.ratio,
+        }
+
+
+retry_budget = RetryBudget()
+ENDPOINTS: dict[str, "StockEndpoint"] = {}
+
+
+def _is_failure(e: Exception) -> bool:
+    """Transport errors, timeouts and 5xx count against the breaker, 4xx answers do not."""
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code >= 500
+    return isinstance(e, (httpx.TransportError, asyncio.TimeoutError))
+
+
+class StockEndpoint:
+    """One stock-service endpoint with its own deadline and circuit breaker.
+
+    idempotent endpoints are also retried after read timeouts and 5xx, the others
+    only when the request provably never left (connect/pool errors).
+    """
+
+    def __init__(self, name: str, deadline: float, idempotent: bool):
+        self.name = name
+        self.deadline = deadline
+        self.idempotent = idempotent
+        self.breaker = CircuitBreaker(name)
+        ENDPOINTS[name] = self
+
+    def _can_retry(self, e: Exception, attempt: int, remaining: float) -> bool:
+        if attempt >= STOCK_MAX_RETRIES or remaining <= 0:
+            return False
+        if not (self.idempotent or isinstance(e, _NOT_SENT)):
+            return False
+        return retry_budget.try_retry()
+
+    async def call(
+        self,
+        send: Callable[[httpx.Timeout], Awaitable[httpx.Response]],
+        timeout: httpx.Timeout | None = None,
+    ) -> dict:
+        """Run send(timeout) under the breaker, the deadline and the retry budget, return the JSON body."""
+        self.breaker.acquire()
+        retry_budget.record_request()
+        base = timeout or stock_timeout()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        attempt = 0
+        while True:
+            remaining = deadline - loop.time()
+            try:
+                resp = await asyncio.wait_for(
+                    send(httpx.Timeout(
+                        connect=min(base.connect or remaining, remaining),
+                        read=min(base.read or remaining, remaining),
+                        write=min(base.write or remaining, remaining),
+                        pool=min(base.pool or remaining, remaining),
+                    )),
+                    timeout=remaining,
+                )
+                resp.raise_for_status()
+            except Exception as e:
+                if not _is_failure(e):
+                    # a 4xx answer proves stock-service is up, any other error says nothing about it
+                    if isinstance(e, httpx.HTTPStatusError):
+                        self.breaker.record_success()
+                    else:
+                        self.breaker.release()
+                    raise
+                self.breaker.record_failure()
+                remaining = deadline - loop.time()
+                if not self._can_retry(e, attempt, remaining):
+                    raise
+                try:
+                    self.breaker.acquire()
+                except CircuitOpenError:
+                    raise e
+                attempt += 1
+                await asyncio.sleep(min(remaining, 0.05 * 2 ** attempt * random.uniform(0.5, 1.0)))
+                continue
+            self.breaker.record_success()
+            return resp.json()
+
+    def stats(self) -> dict:
+        return {"deadline": self.deadline, "idempotent": self.idempotent, **self.breaker.stats()}
+
+
+def stock_client_stats() -> dict:
+    """Breaker state and trip counts per endpoint plus the shared retry budget, for /metrics."""
+    return {
+        "endpoints": {name: endpoint.stats() for name, endpoint in ENDPOINTS.items()},
+        "retry_budget": retry_budget.stats(),
+    }
@@ -0,0 +1,115 @@
+"""Benchmark: plain vs production SQLite profile under a mixed read/write load.
+
+Runs CONCURRENCY coroutines for DURATION seconds against a fresh database file per profile.
+Each operation reads one page of a user's orders (the /order/me query) or, with WRITE_RATIO
+probability, inserts an order with two lines. Reports throughput, read/write p99 and
+"database is locked" errors.
+
+Run from the order_service directory:
+    python bench/sqlite_profile_bench.py
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+DB_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_DIR}/import.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker  # noqa: E402
+from app.config.database import Base  # noqa: E402
+from app.config.sqlite_profile import RoutingSession, create_engines  # noqa: E402
+from app.model.order_model import Order, OrderLine  # noqa: E402
+from app.service.order_service import _my_orders_query  # noqa: E402
+
+USERS = 100
+ORDERS_PER_USER = 20
+CONCURRENCY = 8
+DURATION = 3.0
+WRITE_RATIO = 0.2
+
+
+def p99(samples: list[float]) -> float:
+    if not samples:
+        return 0.0
+    samples.sort()
+    return samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000
+
+
+def new_order(user_id: int, rng: random.Random) -> Order:
+    return Order(
+        user_id=user_id,
+        username=f"user-{user_id}",
+        status="pending",
+        items=[OrderLine(item_id=item_id, amount=1) for item_id in rng.sample(range(1, 1000), 2)],
+    )
+
+
+async def run(profile: str) -> dict:
+    writer, reader = create_engines(f"sqlite+aiosqlite:///{DB_DIR}/{profile}.db", profile)
+    async with writer.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(
+        writer,
+        class_=AsyncSession,
+        sync_session_class=RoutingSession,
+        writer=writer.sync_engine,
+        reader=reader.sync_engine if reader is not None else None,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+    rng = random.Random(0)
+    async with factory() as db:
+        db.add_all(new_order(user_id, rng) for user_id in range(1, USERS + 1) for _ in range(ORDERS_PER_USER))
+        await db.commit()
+
+    reads: list[float] = []
+    writes: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + DURATION
+
+    async def worker(seed: int):
+        nonlocal errors
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            user_id = rng.randint(1, USERS)
+            is_write = rng.random() < WRITE_RATIO
+            start = time.perf_counter()
+            try:
+                async with factory() as db:
+                    if is_write:
+                        db.add(new_order(user_id, rng))
+                        await db.commit()
+                    else:
+                        (await db.execute(_my_orders_query(user_id, None).limit(20))).scalars().all()
+            except OperationalError:
+                errors += 1
+                continue
+            (writes if is_write else reads).append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker(i) for i in range(CONCURRENCY)))
+    await writer.dispose()
+    if reader is not None:
+        await reader.dispose()
+    return {
+        "ops_s": (len(reads) + len(writes)) / DURATION,
+        "read_p99": p99(reads),
+        "write_p99": p99(writes),
+        "errors": errors,
+    }
+
+
+async def main():
+    print(f"{CONCURRENCY} coroutines, {DURATION:.0f}s, {WRITE_RATIO:.0%} writes")
+    print(f"{'profile':>10} | {'ops/s':>8} | {'read p99':>9} | {'write p99':>9} | {'locked':>6}   (ms)")
+    for profile in ("plain", "production"):
+        r = await run(profile)
+        print(f"{profile:>10} | {r['ops_s']:>8.0f} | {r['read_p99']:>9.2f} | {r['write_p99']:>9.2f} | {r['errors']:>6}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
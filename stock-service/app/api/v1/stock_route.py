@@ -1,19 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.service.stock_service import (
     get_item_by_id,
-    get_all_by_category,
+    get_category_listing,
     get_all_items,
+    get_low_stock_items,
+    stream_all_items,
+    search_items,
     check_stock_availability,
     decrease_stock,
+    reserve_stock,
+    reserve_stock_batch,
     increase_one_stock,
-    create_stock_item
+    create_stock_item,
+    import_stock_items
+)
+from app.service.change_feed import ChangesCompacted, get_changes, stream_changes
+from app.service.hold_service import confirm_hold, create_hold, release_hold
+from app.service.low_stock import low_stock_queue
+from app.service.counter_engine import memory_engine_enabled
+from app.service.hot_items import HOT_ITEM_MAX_SHARDS, HOT_ITEM_SHARDS, hot_items, hot_items_enabled
+from app.schema.stock_check_schema import (
+    CheckStockRequest,
+    CheckStockResponse,
+    HoldActionResponse,
+    HoldRequest,
+    HoldResponse,
+    ReserveBatchRequest,
+    ReserveBatchResponse,
+    ReserveStockRequest,
+    ReserveStockResponse,
 )
-from app.schema.stock_check_schema import CheckStockRequest, CheckStockResponse
 from app.config.database import get_db
-from app.schema.stock_schema import StockItemOut, DecreaseStockRequest, StockItemUpdate, StockItemCreate
+from app.util.bulk_reader import iter_csv_rows, iter_ndjson_rows
+from app.schema.stock_schema import BulkImportResponse, HotItemOut, LowStockAlert, StockChangesPage, StockItemOut, StockPage, DecreaseStockRequest, StockItemUpdate, StockItemCreate
 router = APIRouter()
 
+NDJSON = "application/x-ndjson"
+
 @router.get("/stock/one/{id}", response_model=StockItemOut)
 def get_stock_item(id: int, db: Session = Depends(get_db)):
     item = get_item_by_id(id, db)
@@ -22,20 +47,93 @@ def get_stock_item(id: int, db: Session = Depends(get_db)):
     return item
 
 
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
 @router.get("/stock", response_model=list[StockItemOut])
-def get_stock_items_by_category(category: str = Query(...), db: Session = Depends(get_db)):
-    items = get_all_by_category(category, db)
-    if not items:
+def get_stock_items_by_category(
+    category: str = Query(...),
+    if_none_match: str | None = Header(None),
+    db: Session = Depends(get_db)
+):
+    # cache hit: the stored body is sent as is, no DB query and no serialization
+    listing = get_category_listing(category, db)
+    if listing is None:
         raise HTTPException(status_code=404, detail="No items found in the specified category")
-    return items
+    headers = {"ETag": listing.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(if_none_match, listing.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=listing.body, media_type="application/json", headers=headers)
 
 
-@router.get("/stock/all", response_model=list[StockItemOut])
-def get_all_stock_items(db: Session = Depends(get_db)):
-    items = get_all_items(db)
-    if not items:
+@router.get("/stock/all", response_model=StockPage)
+def get_all_stock_items(
+    request: Request,
+    limit: int = Query(100, ge=1, le=1000),
+    after_id: int | None = Query(None),
+    db: Session = Depends(get_db)
+):
+    # Accept: application/x-ndjson -> stream the whole catalogue after after_id instead of one page
+    if NDJSON in request.headers.get("accept", ""):
+        return StreamingResponse(stream_all_items(after_id), media_type=NDJSON)
+
+    page = get_all_items(db, limit, after_id)
+    if not page["items"] and after_id is None:
         raise HTTPException(status_code=404, detail="No items found")
-    return items
+    return page
+
+
+@router.get("/stock/low", response_model=StockPage)
+def get_low_stock_route(
+    limit: int = Query(100, ge=1, le=1000),
+    after_id: int | None = Query(None),
+    db: Session = Depends(get_db)
+):
+    return get_low_stock_items(db, limit, after_id)
+
+@router.get("/stock/low/alerts", response_model=list[LowStockAlert])
+def drain_low_stock_alerts(limit: int = Query(100, ge=1, le=1000)):
+    # vyberie čakajúce upozornenia z fronty, každé dostane len jeden konzument
+    return low_stock_queue.drain(limit)
+
+@router.get("/stock/search", response_model=list[StockItemOut])
+def search_stock_items(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    return search_items(q, db, limit)
+
+@router.get("/stock/changes", response_model=StockChangesPage)
+def get_stock_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db)
+):
+    try:
+        return get_changes(db, since, limit)
+    except ChangesCompacted as e:
+        raise HTTPException(status_code=410, detail=str(e))
+
+
+@router.get("/stock/changes/stream")
+def stream_stock_changes(
+    since: int | None = Query(None, ge=0),
+    last_event_id: str | None = Header(None)
+):
+    # reconnecting EventSource clients send the last seen seq as Last-Event-ID
+    if since is None:
+        since = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+    return StreamingResponse(
+        stream_changes(since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.post("/stock/check", response_model=CheckStockResponse)
@@ -56,12 +154,86 @@ def decrease_stock_route(
         raise HTTPException(status_code=400, detail=result["error"])
     return result
 
+@router.post("/stock/reserve", response_model=ReserveStockResponse)
+def reserve_stock_route(
+    body: ReserveStockRequest,
+    db: Session = Depends(get_db)
+):
+    return reserve_stock(body.items, db, body.reservation_id)
+
+@router.post("/stock/reserve/batch", response_model=ReserveBatchResponse)
+def reserve_stock_batch_route(
+    body: ReserveBatchRequest,
+    db: Session = Depends(get_db)
+):
+    results = reserve_stock_batch(body.orders, db)
+    return ReserveBatchResponse(results=results)
+
+def _require_db_engine():
+    if memory_engine_enabled():
+        raise HTTPException(status_code=409, detail="Stock holds are not available with STOCK_ENGINE=memory")
+
+@router.post("/stock/holds", response_model=HoldResponse)
+def create_hold_route(
+    body: HoldRequest,
+    db: Session = Depends(get_db)
+):
+    _require_db_engine()
+    return create_hold(body.items, db, body.ttl_seconds)
+
+@router.post("/stock/holds/{hold_id}/confirm", response_model=HoldActionResponse)
+def confirm_hold_route(hold_id: str, db: Session = Depends(get_db)):
+    _require_db_engine()
+    result = confirm_hold(hold_id, db)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Hold not found or expired")
+    return result
+
+@router.post("/stock/holds/{hold_id}/release", response_model=HoldActionResponse)
+def release_hold_route(hold_id: str, db: Session = Depends(get_db)):
+    _require_db_engine()
+    result = release_hold(hold_id, db)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Hold not found or expired")
+    return result
+
+def _require_hot_items():
+    if not hot_items_enabled():
+        raise HTTPException(status_code=409, detail="Hot items need HOT_ITEMS=true and STOCK_ENGINE=db")
+
+@router.get("/stock/hot/{id}", response_model=HotItemOut)
+def get_hot_item_route(id: int, db: Session = Depends(get_db)):
+    result = hot_items.describe(id, db)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return result
+
+@router.post("/stock/hot/{id}", response_model=HotItemOut)
+def enable_hot_item_route(
+    id: int,
+    shards: int = Query(HOT_ITEM_SHARDS, ge=1, le=HOT_ITEM_MAX_SHARDS),
+    db: Session = Depends(get_db)
+):
+    _require_hot_items()
+    result = hot_items.enable(id, db, shards)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return result
+
+@router.delete("/stock/hot/{id}", response_model=HotItemOut)
+def disable_hot_item_route(id: int, db: Session = Depends(get_db)):
+    _require_hot_items()
+    result = hot_items.disable(id, db)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Item is not hot")
+    return result
+
 @router.post("/stock/increase-one")
 def increase_one_stock_route(
     body: StockItemUpdate,
     db: Session = Depends(get_db)
 ):
-    result = increase_one_stock(body.id, body.name, body.category, body.amount, db)
+    result = increase_one_stock(body.id, body.name, body.category, body.amount, db, body.reorder_threshold)
     if not result["success"]:
         raise HTTPException(status_code=404, detail=result["error"])
     return result
@@ -73,3 +245,19 @@ def create_stock_route(
 ):
     item = create_stock_item(body, db)
     return item
+
+
+@router.post("/stock/bulk", response_model=BulkImportResponse)
+async def bulk_import_route(
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    # body sa číta po kúskoch, nikdy celý naraz
+    content_type = request.headers.get("content-type", "")
+    if "csv" in content_type:
+        rows = iter_csv_rows(request.stream())
+    elif "ndjson" in content_type or "jsonl" in content_type:
+        rows = iter_ndjson_rows(request.stream())
+    else:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson")
+    return await import_stock_items(rows, db)
@@ -1,19 +1,45 @@
-from sqlalchemy import create_engine
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 from dotenv import load_dotenv
+from app.config.sqlite_profile import CheckpointTask, RoutingSession, create_engines
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./db/default.db")
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+# engine is the (single) writer, reader_engine the read pool; reader_engine is None with SQLITE_PROFILE=plain
+engine, reader_engine = create_engines(DATABASE_URL)
+SessionLocal = sessionmaker(
+    class_=RoutingSession, writer=engine, reader=reader_engine, autocommit=False, autoflush=False, bind=engine
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+checkpoint_task = CheckpointTask(engine) if reader_engine is not None else None
 Base = declarative_base()
 
+def _add_missing_columns(conn):
+    # new columns on existing tables, they need a server_default (or nullable) so old rows stay valid
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {CreateColumn(column).compile(dialect=conn.dialect)}")
+
+def _create_schema(conn):
+    _add_missing_columns(conn)
+    Base.metadata.create_all(conn)
+    # create_all only builds indexes together with new tables, add the missing ones to existing tables
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+def init_db():
+    with engine.begin() as conn:
+        _create_schema(conn)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -1,17 +1,48 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.config.database import Base, engine
+from app.config.database import SessionLocal, checkpoint_task, init_db
+from app.service.counter_engine import STOCK_ENGINE, counter_engine
+from app.service.change_feed import change_broadcaster
+from app.service.hold_service import hold_sweeper
+from app.service.hot_items import HOT_ITEMS, HotItems, hot_items
 from app.api.v1 import stock_route
 from app.middleware.logger_middleware import logger_middleware
 
+# DB init
+init_db()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # STOCK_ENGINE=memory: counters live in this process, flushed to SQLite in the background
+    # HOT_ITEMS=true: sharded in-memory counters for items flagged as hot, otherwise their shards go back to the rows
+    if HOT_ITEMS and STOCK_ENGINE != "memory":
+        hot_items.start(SessionLocal)
+    else:
+        HotItems.fold_all(SessionLocal)
+    if STOCK_ENGINE == "memory":
+        counter_engine.start(SessionLocal)
+    else:
+        hold_sweeper.start()
+    change_broadcaster.start()
+    if checkpoint_task is not None:
+        checkpoint_task.start()
+    yield
+    if checkpoint_task is not None:
+        checkpoint_task.stop()
+    await change_broadcaster.stop()
+    hold_sweeper.stop()
+    hot_items.stop()
+    counter_engine.stop()
+
+
 app = FastAPI(
     title="Stock Service API",
     description="A simple stock management service",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# DB init
-Base.metadata.create_all(bind=engine)
-
 # Middleware
 app.middleware("http")(logger_middleware)
 
@@ -1,11 +1,96 @@
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import String
+from sqlalchemy import String, JSON, DateTime, ForeignKey, Index, event, func, text
+from datetime import timezone
 from app.config.database import Base
+from datetime import datetime
 
 class StockItem(Base):
     __tablename__ = "stock_items"
+    # partial index: only items at or below their reorder threshold, GET /stock/low pages through it by id
+    __table_args__ = (Index("ix_stock_items_low", "id", sqlite_where=text("amount <= reorder_threshold")),)
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True, autoincrement=True)
-    category: Mapped[str] = mapped_column(String, nullable=False)
+    category: Mapped[str] = mapped_column(String, nullable=False, index=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
     amount: Mapped[int] = mapped_column(nullable=False, default=0)
+    # on-hand units held by open holds, available-to-sell is amount - held
+    held: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+    # hot items keep their available units in stock_shards, the row only keeps the rest (see app.service.hot_items)
+    is_hot: Mapped[bool] = mapped_column(nullable=False, default=False, server_default="0")
+    # NULL = no low stock alerts for the item
+    reorder_threshold: Mapped[int | None] = mapped_column(nullable=True)
+
+
+# Full-text index over name and category for /stock/search. External content: the text is only stored
+# in stock_items, the triggers keep the index in sync with inserts, upserts and name/category updates.
+# remove_diacritics lets "cokolada" find "čokoláda", the prefix indexes keep short prefix queries fast.
+STOCK_SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE stock_items_fts USING fts5("
+    "name, category, content='stock_items', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')",
+    "CREATE TRIGGER stock_items_fts_insert AFTER INSERT ON stock_items BEGIN "
+    "INSERT INTO stock_items_fts(rowid, name, category) VALUES (new.id, new.name, new.category); END",
+    "CREATE TRIGGER stock_items_fts_delete AFTER DELETE ON stock_items BEGIN "
+    "INSERT INTO stock_items_fts(stock_items_fts, rowid, name, category) VALUES ('delete', old.id, old.name, old.category); END",
+    "CREATE TRIGGER stock_items_fts_update AFTER UPDATE OF name, category ON stock_items BEGIN "
+    "INSERT INTO stock_items_fts(stock_items_fts, rowid, name, category) VALUES ('delete', old.id, old.name, old.category); "
+    "INSERT INTO stock_items_fts(rowid, name, category) VALUES (new.id, new.name, new.category); END",
+    # index the rows that existed before the search index
+    "INSERT INTO stock_items_fts(stock_items_fts) VALUES ('rebuild')",
+)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_search_index(target, connection, **kw):
+    if connection.dialect.name != "sqlite":
+        return
+    if connection.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'stock_items_fts'").first() is None:
+        for statement in STOCK_SEARCH_DDL:
+            connection.exec_driver_sql(statement)
+
+
+class StockShard(Base):
+    """One slice of a hot item's available stock. The on-hand total is StockItem.amount plus all its shards."""
+    __tablename__ = "stock_shards"
+
+    item_id: Mapped[int] = mapped_column(ForeignKey("stock_items.id", ondelete="CASCADE"), primary_key=True)
+    shard: Mapped[int] = mapped_column(primary_key=True)
+    amount: Mapped[int] = mapped_column(nullable=False, default=0)
+
+
+class StockReservation(Base):
+    """Reservation ids that were already applied, so a retried reserve call is not decremented twice."""
+    __tablename__ = "stock_reservations"
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)
+    item_ids: Mapped[list] = mapped_column(JSON, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+
+
+class StockHold(Base):
+    """Stock held for a checkout until it is confirmed, released or expires. Open holds are summed in StockItem.held."""
+    __tablename__ = "stock_holds"
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)
+    # [{"id": item_id, "amount": amount}, ...]
+    items: Mapped[list] = mapped_column(JSON, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class StockChange(Base):
+    """Change log of stock amounts. seq is strictly increasing and never reused (AUTOINCREMENT),
+    so consumers can resume from the last seq they saw. Old rows are removed by retention."""
+    __tablename__ = "stock_changes"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    item_id: Mapped[int] = mapped_column(nullable=False)
+    # create, update, decrease, reserve, bulk, confirm, sync (write-behind flush of the memory engine)
+    op: Mapped[str] = mapped_column(String, nullable=False)
+    amount: Mapped[int] = mapped_column(nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=_utcnow, nullable=False, index=True)
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, AliasChoices, ConfigDict
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
 class CheckItem(BaseModel):
     # prijme buď "item_id" alebo "id", interne to bude "id"
@@ -18,3 +19,35 @@ class MissingItem(BaseModel):
 class CheckStockResponse(BaseModel):
     available: bool
     missing: List[MissingItem] = []
+
+class ReserveStockRequest(BaseModel):
+    items: List[CheckItem]
+    # voliteľný kľúč, opakované volanie s rovnakým kľúčom sklad už neznižuje
+    reservation_id: Optional[str] = None
+
+class ReserveStockResponse(BaseModel):
+    success: bool
+    reserved: List[int] = []
+    missing: List[MissingItem] = []
+
+class ReserveBatchRequest(BaseModel):
+    orders: List[ReserveStockRequest]
+
+class ReserveBatchResponse(BaseModel):
+    results: List[ReserveStockResponse]
+
+class HoldRequest(BaseModel):
+    items: List[CheckItem] = Field(min_length=1)
+    # platnosť holdu v sekundách, predvolene HOLD_TTL
+    ttl_seconds: Optional[int] = Field(None, ge=1)
+
+class HoldResponse(BaseModel):
+    success: bool
+    hold_id: Optional[str] = None
+    expires_at: Optional[datetime] = None
+    missing: List[MissingItem] = []
+
+class HoldActionResponse(BaseModel):
+    success: bool
+    hold_id: str
+    items: List[CheckItem]
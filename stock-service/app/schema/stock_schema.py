@@ -1,10 +1,13 @@
 from pydantic import BaseModel, Field, AliasChoices, ConfigDict
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
 class StockItemBase(BaseModel):
     category: str
     name: str
     amount: int
+    # pri amount <= reorder_threshold je položka v /stock/low; None = bez upozornení (pri update = bez zmeny)
+    reorder_threshold: Optional[int] = Field(None, ge=0)
 
 class StockItemCreate(StockItemBase):
     pass
@@ -25,3 +28,51 @@ class StockItemOut(StockItemBase):
     id: int
     class Config:
         orm_mode = True
+
+class BulkStockRow(StockItemBase):
+    # bez id = nová položka, s id = upsert existujúcej
+    id: Optional[int] = None
+
+class BulkRowError(BaseModel):
+    line: int
+    error: str
+
+class BulkImportResponse(BaseModel):
+    inserted: int = 0
+    updated: int = 0
+    failed: int = 0
+    # prvých BULK_MAX_ERRORS chýb, failed obsahuje celkový počet
+    errors: List[BulkRowError] = []
+
+class StockChangeOut(BaseModel):
+    seq: int
+    item_id: int
+    op: str
+    amount: int
+    created_at: datetime
+
+class StockChangesPage(BaseModel):
+    changes: List[StockChangeOut]
+    # pošli ako since pri ďalšom volaní
+    last_seq: int
+
+class StockPage(BaseModel):
+    items: List[StockItemOut]
+    # id posledného riadku, pošli ako after_id pre ďalšiu stránku; None = posledná stránka
+    next_after_id: Optional[int] = None
+
+class HotItemOut(BaseModel):
+    id: int
+    hot: bool
+    # dostupné kusy v jednotlivých shardoch, prázdne ak položka nie je hot
+    shards: List[int] = []
+    # celkové množstvo na sklade (riadok + shardy)
+    amount: int
+
+class LowStockAlert(BaseModel):
+    item_id: int
+    amount: int
+    threshold: int
+    # decrease, reserve, sync (hot item)
+    op: str
+    created_at: datetime
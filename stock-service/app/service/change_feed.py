@@ -0,0 +1,241 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Iterable
+from sqlalchemy import delete, func, insert, literal, select, text
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.config.database import SessionLocal
+from app.model.stock_model import StockChange, StockItem, StockShard
+
+logger = logging.getLogger(__name__)
+
+CHANGES_RETENTION = float(os.getenv("CHANGES_RETENTION", "86400"))
+CHANGES_COMPACT_INTERVAL = float(os.getenv("CHANGES_COMPACT_INTERVAL", "60"))
+# per subscriber; a subscriber that falls further behind re-reads the log from its last seq
+CHANGES_BUFFER_SIZE = int(os.getenv("CHANGES_BUFFER_SIZE", "1000"))
+# idle SSE streams send a keepalive and re-read the log, which also picks up other workers' writes
+CHANGES_KEEPALIVE = float(os.getenv("CHANGES_KEEPALIVE", "15"))
+CHANGES_PAGE_SIZE = 500
+
+
+class ChangesCompacted(Exception):
+    """The requested seq was already removed by retention, the consumer has to resync from /stock/all."""
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _as_dict(row) -> dict:
+    return {
+        "seq": row.seq,
+        "item_id": row.item_id,
+        "op": row.op,
+        "amount": row.amount,
+        "created_at": row.created_at.isoformat(),
+    }
+
+
+# on-hand amount: the row plus the shards of a hot item
+_on_hand = StockItem.amount + (
+    select(func.coalesce(func.sum(StockShard.amount), 0)).where(StockShard.item_id == StockItem.id).scalar_subquery()
+)
+
+
+def record_changes(db: Session, item_ids: Iterable[int], op: str) -> list[dict]:
+    """Append the current amounts of the items to the change log, inside the caller's transaction.
+    Pass the result to change_broadcaster.publish() after the commit.
+    """
+    ids = list(dict.fromkeys(item_ids))
+    if not ids:
+        return []
+    stmt = (
+        insert(StockChange)
+        .from_select(
+            ["item_id", "op", "amount"],
+            select(StockItem.id, literal(op), _on_hand).where(StockItem.id.in_(ids)).order_by(StockItem.id),
+        )
+        .returning(StockChange.seq, StockChange.item_id, StockChange.op, StockChange.amount, StockChange.created_at)
+    )
+    return sorted((_as_dict(row) for row in db.execute(stmt)), key=lambda change: change["seq"])
+
+
+def _last_seq(db: Session) -> int:
+    # sqlite_sequence keeps the highest seq even after retention deleted every row
+    return db.execute(text("SELECT seq FROM sqlite_sequence WHERE name = 'stock_changes'")).scalar() or 0
+
+
+def get_changes(db: Session, since: int = 0, limit: int = CHANGES_PAGE_SIZE) -> dict:
+    """Get changes with seq greater than since, oldest first.
+    Args:
+        db (Session): The database session.
+        since (int): The last seq the consumer has seen, 0 for the whole retained log.
+        limit (int): Maximum number of changes.
+
+    Returns:
+        dict: "changes" and "last_seq", the seq to pass as since next time.
+
+    Raises:
+        ChangesCompacted: If changes after since were already removed by retention.
+    """
+    rows = db.execute(
+        select(StockChange).where(StockChange.seq > since).order_by(StockChange.seq).limit(limit)
+    ).scalars().all()
+    if since > 0 and (not rows or rows[0].seq != since + 1):
+        # a gap right after since means retention removed it, unless nothing newer exists yet
+        if since < (rows[0].seq - 1 if rows else _last_seq(db)):
+            raise ChangesCompacted(f"Changes after seq {since} were removed by retention")
+    changes = [_as_dict(row) for row in rows]
+    return {"changes": changes, "last_seq": changes[-1]["seq"] if changes else since}
+
+
+def compact_changes(db: Session, retention: float = CHANGES_RETENTION) -> int:
+    """Delete changes older than the retention period. Returns the number of removed rows."""
+    result = db.execute(delete(StockChange).where(StockChange.created_at < utcnow() - timedelta(seconds=retention)))
+    db.commit()
+    return result.rowcount
+
+
+class Subscription:
+    """Bounded buffer of one SSE consumer, filled on its event loop."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.loop = loop
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def deliver(self, changes: list[dict]) -> None:
+        for change in changes:
+            try:
+                self.queue.put_nowait(change)
+            except asyncio.QueueFull:
+                # never block writers on a slow consumer, it catches up from the log instead
+                self.overflowed = True
+                return
+
+
+class ChangeBroadcaster:
+    """In-process fan-out of committed changes to SSE subscribers, plus the retention task."""
+
+    def __init__(self, buffer_size: int = CHANGES_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self._subscribers: set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._compaction: asyncio.Task | None = None
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(asyncio.get_running_loop(), self.buffer_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, changes: list[dict]) -> None:
+        """Hand committed changes to every subscriber. Safe to call from worker threads."""
+        if not changes:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.loop.call_soon_threadsafe(subscription.deliver, changes)
+
+    def start(self) -> None:
+        if self._compaction is None:
+            self._compaction = asyncio.create_task(self._compact_periodically(), name="stock-changes-compaction")
+
+    async def stop(self) -> None:
+        if self._compaction is not None:
+            self._compaction.cancel()
+            try:
+                await self._compaction
+            except asyncio.CancelledError:
+                pass
+            self._compaction = None
+
+    async def _compact_periodically(self) -> None:
+        while True:
+            try:
+                removed = await run_in_threadpool(_compact_once)
+                if removed:
+                    logger.info("Removed %s stock changes past retention", removed)
+            except Exception:
+                logger.exception("Stock change log compaction failed")
+            await asyncio.sleep(CHANGES_COMPACT_INTERVAL)
+
+
+change_broadcaster = ChangeBroadcaster()
+
+
+def _compact_once() -> int:
+    with SessionLocal() as db:
+        return compact_changes(db)
+
+
+def _read_page(since: int) -> dict:
+    with SessionLocal() as db:
+        return get_changes(db, since)
+
+
+def _sse(change: dict) -> str:
+    return f"id: {change['seq']}\nevent: change\ndata: {json.dumps(change, separators=(',', ':'))}\n\n"
+
+
+async def stream_changes(since: int) -> AsyncIterator[str]:
+    """Server-Sent Events of all changes after since: first the backlog from the log, then live changes.
+    Live changes arrive through the broadcaster; a gap in seq, a buffer overflow or an idle
+    keepalive make the stream re-read the log, so nothing is skipped or sent twice.
+    """
+    subscription = change_broadcaster.subscribe()
+    last = since
+
+    async def catch_up() -> AsyncIterator[str]:
+        nonlocal last
+        while True:
+            try:
+                page = await run_in_threadpool(_read_page, last)
+            except ChangesCompacted as e:
+                yield f"event: compacted\ndata: {json.dumps({'detail': str(e)})}\n\n"
+                raise
+            for change in page["changes"]:
+                yield _sse(change)
+            last = page["last_seq"]
+            if len(page["changes"]) < CHANGES_PAGE_SIZE:
+                return
+
+    try:
+        async for event in catch_up():
+            yield event
+        while True:
+            if subscription.overflowed:
+                subscription.overflowed = False
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                async for event in catch_up():
+                    yield event
+            try:
+                change = await asyncio.wait_for(subscription.queue.get(), timeout=CHANGES_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                async for event in catch_up():
+                    yield event
+                continue
+            if change["seq"] <= last:
+                continue
+            if change["seq"] > last + 1:
+                # committed by another worker or published out of order, the log has everything
+                async for event in catch_up():
+                    yield event
+                continue
+            yield _sse(change)
+            last = change["seq"]
+    except ChangesCompacted:
+        return
+    finally:
+        change_broadcaster.unsubscribe(subscription)
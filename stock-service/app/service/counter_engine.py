@@ -0,0 +1,272 @@
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.orm.attributes import set_committed_value
+from app.model.stock_model import StockItem, StockReservation
+from app.service.change_feed import change_broadcaster, record_changes
+
+logger = logging.getLogger(__name__)
+
+# "db" (default): every operation goes to SQLite. "memory": amounts live in this process
+# and are flushed to SQLite in batches. Memory mode needs a single worker process.
+STOCK_ENGINE = os.getenv("STOCK_ENGINE", "db").lower()
+COUNTER_FLUSH_INTERVAL = float(os.getenv("COUNTER_FLUSH_INTERVAL", "0.2"))
+COUNTER_JOURNAL_PATH = os.getenv("COUNTER_JOURNAL_PATH", "./db/stock_counters.journal")
+# fsync every journal write: survives power loss, not only process crashes, but costs a disk flush per write
+COUNTER_JOURNAL_FSYNC = os.getenv("COUNTER_JOURNAL_FSYNC", "false").lower() in ("1", "true", "yes")
+
+_set_amount_stmt = (
+    update(StockItem.__table__)
+    .where(StockItem.__table__.c.id == bindparam("b_id"))
+    .values(amount=bindparam("b_amount"))
+)
+
+
+class CounterEngine:
+    """In-memory, authoritative stock counters with a write-ahead journal and write-behind flushing.
+
+    Every change is applied under one lock and appended to the journal as the item's new
+    absolute amount, so replaying a journal is idempotent. A background thread writes the
+    changed amounts to SQLite every COUNTER_FLUSH_INTERVAL seconds as one executemany,
+    then drops the journal segment it covered. On start the DB state is loaded and any
+    leftover journal segments are replayed on top of it.
+    """
+
+    def __init__(self, journal_path: str = COUNTER_JOURNAL_PATH, flush_interval: float = COUNTER_FLUSH_INTERVAL):
+        self.journal_path = journal_path
+        self.flush_interval = flush_interval
+        self.running = False
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._amounts: dict[int, int] = {}
+        self._dirty: dict[int, int] = {}
+        self._reservations: dict[str, list[int]] = {}
+        self._flushing_reservations: dict[str, list[int]] = {}
+        self._journal = None
+        self._segment = 0
+        self._process_lock = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._session_factory: sessionmaker | None = None
+        self.flushes = 0
+        self.flushed_rows = 0
+
+    # lifecycle
+
+    def start(self, session_factory: sessionmaker) -> None:
+        """Load amounts from the DB, replay the journal and start the flush thread."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True)
+        self._process_lock = open(self.journal_path + ".lock", "w")
+        try:
+            fcntl.flock(self._process_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise RuntimeError("STOCK_ENGINE=memory needs a single worker process, the journal is locked by another one")
+
+        self._session_factory = session_factory
+        with session_factory() as db:
+            self._amounts = dict(db.execute(select(StockItem.id, StockItem.amount)).all())
+        replayed = self._replay()
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self.running = True
+        if replayed:
+            logger.info("Replayed %s stock journal entries", replayed)
+            self.flush()
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stock-counter-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flush thread and write everything that is still pending."""
+        if not self.running:
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        self.running = False
+        self._journal.close()
+        fcntl.flock(self._process_lock, fcntl.LOCK_UN)
+        self._process_lock.close()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Stock counter flush failed")
+
+    # journal
+
+    def _segments(self) -> list[str]:
+        return sorted(glob.glob(self.journal_path + ".*.flushing"))
+
+    def _replay(self) -> int:
+        replayed = 0
+        for path in self._segments() + [self.journal_path]:
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding="utf-8") as journal:
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # torn last line from a crash mid-write
+                        continue
+                    if "reservation" in entry:
+                        self._reservations[entry["reservation"]] = entry["items"]
+                    elif entry.get("synced"):
+                        self._amounts[entry["id"]] = entry["amount"]
+                        self._dirty.pop(entry["id"], None)
+                    else:
+                        self._amounts[entry["id"]] = entry["amount"]
+                        self._dirty[entry["id"]] = entry["amount"]
+                    replayed += 1
+            segment = path.rsplit(".", 2)
+            if path != self.journal_path and len(segment) == 3 and segment[1].isdigit():
+                self._segment = max(self._segment, int(segment[1]))
+        if os.path.exists(self.journal_path):
+            self._segment += 1
+            os.rename(self.journal_path, f"{self.journal_path}.{self._segment:012d}.flushing")
+        return replayed
+
+    def _write(self, entries: list[dict]) -> None:
+        """Append journal entries. Called with self._lock held, before the change is acknowledged."""
+        self._journal.write("".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries))
+        self._journal.flush()
+        if COUNTER_JOURNAL_FSYNC:
+            os.fsync(self._journal.fileno())
+
+    def _set(self, changes: dict[int, int], entries: list[dict] | None = None) -> None:
+        entries = (entries or []) + [{"id": item_id, "amount": amount} for item_id, amount in changes.items()]
+        self._write(entries)
+        self._amounts.update(changes)
+        self._dirty.update(changes)
+
+    # write-behind
+
+    def flush(self) -> int:
+        """Write changed amounts and applied reservations to SQLite. Returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty and not self._reservations:
+                    return 0
+                snapshot, self._dirty = self._dirty, {}
+                self._flushing_reservations, self._reservations = self._reservations, {}
+                self._journal.close()
+                self._segment += 1
+                os.rename(self.journal_path, f"{self.journal_path}.{self._segment:012d}.flushing")
+                self._journal = open(self.journal_path, "a", encoding="utf-8")
+                segment = self._segment
+
+            changes = []
+            try:
+                with self._session_factory() as db:
+                    if snapshot:
+                        db.execute(_set_amount_stmt, [
+                            {"b_id": item_id, "b_amount": amount} for item_id, amount in snapshot.items()
+                        ])
+                    if self._flushing_reservations:
+                        db.execute(
+                            sqlite_insert(StockReservation).on_conflict_do_nothing(),
+                            [{"id": rid, "item_ids": items} for rid, items in self._flushing_reservations.items()],
+                        )
+                    changes = record_changes(db, snapshot, "sync")
+                    db.commit()
+            except Exception:
+                # keep everything pending, the journal segment stays on disk until a later flush succeeds
+                with self._lock:
+                    for item_id in snapshot:
+                        self._dirty.setdefault(item_id, self._amounts[item_id])
+                    self._reservations = {**self._flushing_reservations, **self._reservations}
+                    self._flushing_reservations = {}
+                raise
+
+            self._flushing_reservations = {}
+            change_broadcaster.publish(changes)
+            for path in self._segments():
+                if int(path.rsplit(".", 2)[1]) <= segment:
+                    os.remove(path)
+            self.flushes += 1
+            self.flushed_rows += len(snapshot)
+            return len(snapshot)
+
+    # stock operations
+
+    def amounts(self, ids) -> dict[int, int]:
+        with self._lock:
+            return {item_id: self._amounts[item_id] for item_id in ids if item_id in self._amounts}
+
+    def track(self, amounts: dict[int, int]) -> None:
+        """Register new items or absolute amounts written directly to the DB.
+        They are already stored and logged, so they are journaled as synced and not marked dirty.
+        """
+        if not amounts:
+            return
+        with self._lock:
+            self._write([{"id": item_id, "amount": amount, "synced": True} for item_id, amount in amounts.items()])
+            self._amounts.update(amounts)
+            for item_id in amounts:
+                self._dirty.pop(item_id, None)
+
+    def overlay(self, items: list[StockItem]) -> list[StockItem]:
+        """Replace DB amounts of loaded items with the live counters, without marking them dirty."""
+        live = self.amounts(item.id for item in items)
+        for item in items:
+            if item.id in live:
+                set_committed_value(item, "amount", live[item.id])
+        return items
+
+    def decrease(self, requested: dict[int, int]) -> tuple[list[int], list[int]]:
+        """Decrease every line that has enough stock. Returns (decreased ids, ids without enough stock)."""
+        with self._lock:
+            changes = {
+                item_id: self._amounts[item_id] - amount
+                for item_id, amount in requested.items()
+                if self._amounts.get(item_id, 0) >= amount
+            }
+            if changes:
+                self._set(changes)
+        return list(changes), [item_id for item_id in requested if item_id not in changes]
+
+    def reserve(self, requested: dict[int, int], reservation_id: str | None, db: Session) -> tuple[bool, dict[int, int]]:
+        """All-or-nothing decrease of one order. Returns (success, current amounts of the requested ids).
+        A reservation_id that was already applied succeeds without decreasing again."""
+        if reservation_id is not None and db.get(StockReservation, reservation_id) is not None:
+            return True, {}
+        with self._lock:
+            if reservation_id is not None and (
+                reservation_id in self._reservations or reservation_id in self._flushing_reservations
+            ):
+                return True, {}
+            current = {item_id: self._amounts.get(item_id, 0) for item_id in requested}
+            if any(current[item_id] < amount for item_id, amount in requested.items()):
+                return False, current
+            entries = [{"reservation": reservation_id, "items": list(requested)}] if reservation_id else None
+            self._set({item_id: current[item_id] - amount for item_id, amount in requested.items()}, entries)
+            if reservation_id is not None:
+                self._reservations[reservation_id] = list(requested)
+        return True, current
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "engine": "memory",
+                "items": len(self._amounts),
+                "dirty": len(self._dirty),
+                "flushes": self.flushes,
+                "flushed_rows": self.flushed_rows,
+            }
+
+
+counter_engine = CounterEngine()
+
+
+def memory_engine_enabled() -> bool:
+    return STOCK_ENGINE == "memory" and counter_engine.running
@@ -0,0 +1,239 @@
+import heapq
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import bindparam, delete, func, select, update
+from sqlalchemy.orm import Session
+from app.config.database import SessionLocal
+from app.model.stock_model import StockHold, StockItem
+from app.schema.stock_check_schema import CheckItem, HoldActionResponse, HoldResponse, MissingItem
+from app.service.change_feed import change_broadcaster, record_changes
+from app.service.hot_items import hot_items
+from app.service.stock_queries import fetch_amounts, merge_amounts
+from app.util.category_cache import category_cache
+
+logger = logging.getLogger(__name__)
+
+HOLD_TTL = int(os.getenv("HOLD_TTL", "900"))
+HOLD_MAX_TTL = int(os.getenv("HOLD_MAX_TTL", "3600"))
+HOLD_RETRIES = 3
+HOLD_RETRY_DELAY = 5.0
+
+_items = StockItem.__table__
+
+# held grows only while amount - held still covers the request
+_hold_stmt = (
+    update(_items)
+    .where(_items.c.id == bindparam("b_id"))
+    .where(_items.c.amount - _items.c.held >= bindparam("b_amount"))
+    .values(held=_items.c.held + bindparam("b_amount"))
+)
+# hot items: the held units come out of the shards and are put back on the row as held
+_hold_hot_stmt = (
+    update(_items)
+    .where(_items.c.id == bindparam("b_id"))
+    .values(amount=_items.c.amount + bindparam("b_amount"), held=_items.c.held + bindparam("b_amount"))
+)
+_release_stmt = (
+    update(_items)
+    .where(_items.c.id == bindparam("b_id"))
+    .values(held=func.max(_items.c.held - bindparam("b_amount"), 0))
+)
+_confirm_stmt = (
+    update(_items)
+    .where(_items.c.id == bindparam("b_id"))
+    .values(
+        amount=_items.c.amount - bindparam("b_amount"),
+        held=func.max(_items.c.held - bindparam("b_amount"), 0),
+    )
+)
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def create_hold(items: list[CheckItem], db: Session, ttl_seconds: int | None = None) -> HoldResponse:
+    """Hold stock for a checkout without decreasing on-hand amounts.
+    All lines are held or none, like reserve_stock.
+    Args:
+        items (list[CheckItem]): The lines to hold.
+        db (Session): The database session.
+        ttl_seconds (int | None): Hold lifetime, HOLD_TTL by default and at most HOLD_MAX_TTL.
+
+    Returns:
+        HoldResponse: The hold id and its expiry on success, otherwise the per-item shortfall.
+    """
+    requested = merge_amounts(items)
+    stock: dict[int, int] = {}
+    # the held hot units are written to their shards in the hold's transaction
+    with hot_items.durable():
+        hot, cold = hot_items.split(requested)
+        for _ in range(HOLD_RETRIES):
+            held = 0
+            if cold:
+                held = db.execute(
+                    _hold_stmt, [{"b_id": item_id, "b_amount": amount} for item_id, amount in cold.items()]
+                ).rowcount
+            # hot lines last, so they do not have to be given back when a cold line is short
+            if held == len(cold) and hot_items.take_all(hot):
+                try:
+                    if hot:
+                        hot_items.write_through(hot, db)
+                        db.execute(_hold_hot_stmt, [
+                            {"b_id": item_id, "b_amount": amount} for item_id, amount in hot.items()
+                        ])
+                    hold = StockHold(
+                        id=uuid.uuid4().hex,
+                        items=[{"id": item_id, "amount": amount} for item_id, amount in requested.items()],
+                        expires_at=utcnow() + timedelta(seconds=min(ttl_seconds or HOLD_TTL, HOLD_MAX_TTL)),
+                    )
+                    db.add(hold)
+                    db.commit()
+                except Exception:
+                    hot_items.give_back(hot)
+                    raise
+                hold_sweeper.schedule(hold.id, hold.expires_at)
+                return HoldResponse(success=True, hold_id=hold.id, expires_at=hold.expires_at)
+            db.rollback()
+            hot, cold = hot_items.split(requested)
+
+            stock = fetch_amounts(requested, db)
+            missing = [
+                MissingItem(id=item_id, requested=amount, available=stock.get(item_id, 0))
+                for item_id, amount in requested.items()
+                if stock.get(item_id, 0) < amount
+            ]
+            if missing:
+                return HoldResponse(success=False, missing=missing)
+
+    logger.error("Stock hold kept conflicting with concurrent writers: ids=%s", list(requested))
+    return HoldResponse(
+        success=False,
+        missing=[
+            MissingItem(id=item_id, requested=amount, available=stock.get(item_id, 0))
+            for item_id, amount in requested.items()
+        ]
+    )
+
+
+def _close_hold(hold_id: str, db: Session, stmt, *conditions, op: str | None = None) -> list[dict] | None:
+    """Delete the hold and apply stmt to its lines in one transaction.
+    The DELETE ... RETURNING claims the hold, so a hold is confirmed, released or expired exactly once.
+    With op, the new amounts are also written to the change log.
+    """
+    lines = db.execute(
+        delete(StockHold).where(StockHold.id == hold_id, *conditions).returning(StockHold.items)
+    ).scalar_one_or_none()
+    if lines is None:
+        db.rollback()
+        return None
+    db.execute(stmt, [{"b_id": line["id"], "b_amount": line["amount"]} for line in lines])
+    changes = record_changes(db, (line["id"] for line in lines), op) if op else []
+    db.commit()
+    change_broadcaster.publish(changes)
+    return lines
+
+
+def confirm_hold(hold_id: str, db: Session) -> HoldActionResponse | None:
+    """Turn an open hold into a real decrement of on-hand stock.
+    Args:
+        hold_id (str): The hold to confirm.
+        db (Session): The database session.
+
+    Returns:
+        HoldActionResponse | None: The confirmed lines, or None if the hold does not exist or has expired.
+    """
+    lines = _close_hold(hold_id, db, _confirm_stmt, StockHold.expires_at > utcnow(), op="confirm")
+    if lines is None:
+        return None
+    category_cache.invalidate_items(line["id"] for line in lines)
+    return HoldActionResponse(success=True, hold_id=hold_id, items=lines)
+
+
+def release_hold(hold_id: str, db: Session) -> HoldActionResponse | None:
+    """Give the held stock back to available-to-sell.
+    Args:
+        hold_id (str): The hold to release.
+        db (Session): The database session.
+
+    Returns:
+        HoldActionResponse | None: The released lines, or None if the hold does not exist (anymore).
+    """
+    lines = _close_hold(hold_id, db, _release_stmt)
+    if lines is None:
+        return None
+    return HoldActionResponse(success=True, hold_id=hold_id, items=lines)
+
+
+class HoldSweeper:
+    """Expires holds from a min-heap of (expires_at, hold_id), no periodic table scans.
+
+    The thread sleeps until the earliest expiry and is woken when an earlier hold is scheduled.
+    Confirmed or released holds stay in the heap until their time comes and are then skipped,
+    because the DELETE finds no row. Each worker loads all open holds on start and schedules
+    the ones it creates, so a hold is expired even if the worker that created it is gone.
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[datetime, str]] = []
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+        self.expired = 0
+
+    def start(self) -> None:
+        with SessionLocal() as db:
+            pending = db.execute(select(StockHold.expires_at, StockHold.id)).all()
+        with self._cond:
+            self._heap = [tuple(row) for row in pending]
+            heapq.heapify(self._heap)
+            self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="stock-hold-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join()
+        self._thread = None
+
+    def schedule(self, hold_id: str, expires_at: datetime) -> None:
+        with self._cond:
+            heapq.heappush(self._heap, (expires_at, hold_id))
+            if self._heap[0][1] == hold_id:
+                self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    delay = (self._heap[0][0] - utcnow()).total_seconds()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                if self._stopping:
+                    return
+                now = utcnow()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    due.append(heapq.heappop(self._heap)[1])
+            for hold_id in due:
+                try:
+                    with SessionLocal() as db:
+                        if _close_hold(hold_id, db, _release_stmt, StockHold.expires_at <= utcnow()) is not None:
+                            self.expired += 1
+                except Exception:
+                    logger.exception("Expiring stock hold %s failed, retrying later", hold_id)
+                    self.schedule(hold_id, utcnow() + timedelta(seconds=HOLD_RETRY_DELAY))
+
+
+hold_sweeper = HoldSweeper()
@@ -0,0 +1,497 @@
+import fcntl
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.orm.attributes import set_committed_value
+from app.model.stock_model import StockItem, StockShard
+from app.service.change_feed import change_broadcaster, record_changes
+from app.service.low_stock import crossings, low_stock_queue
+
+logger = logging.getLogger(__name__)
+
+# Opt-in. Hot item counters live in this process like STOCK_ENGINE=memory, so it needs a single worker process.
+HOT_ITEMS = os.getenv("HOT_ITEMS", "false").lower() in ("1", "true", "yes")
+HOT_ITEM_SHARDS = int(os.getenv("HOT_ITEM_SHARDS", "8"))
+HOT_ITEM_MAX_SHARDS = 64
+# a crash loses at most this much of hot item decrements, the units show up as available again;
+# reservations with a reservation_id and holds write their shards in their own transaction instead
+HOT_FLUSH_INTERVAL = float(os.getenv("HOT_FLUSH_INTERVAL", "0.1"))
+HOT_REBALANCE_INTERVAL = float(os.getenv("HOT_REBALANCE_INTERVAL", "1"))
+HOT_ITEMS_LOCK_PATH = os.getenv("HOT_ITEMS_LOCK_PATH", "./db/hot_items.lock")
+
+_items = StockItem.__table__
+_shards = StockShard.__table__
+
+_set_shard_stmt = (
+    update(_shards)
+    .where(_shards.c.item_id == bindparam("b_item"), _shards.c.shard == bindparam("b_shard"))
+    .values(amount=bindparam("b_amount"))
+)
+# moves spare row stock (released holds, increases) into the shards
+_absorb_stmt = (
+    update(_items)
+    .where(_items.c.id == bindparam("b_id"), _items.c.amount - _items.c.held >= bindparam("b_amount"))
+    .values(amount=_items.c.amount - bindparam("b_amount"))
+)
+
+
+def _split(total: int, shards: int) -> list[int]:
+    base, extra = divmod(total, shards)
+    return [base + (1 if shard < extra else 0) for shard in range(shards)]
+
+
+class _Slot:
+    __slots__ = ("lock", "amount", "dirty")
+
+    def __init__(self, amount: int):
+        self.lock = threading.Lock()
+        self.amount = amount
+        self.dirty = False
+
+
+class _HotItem:
+    """The shards of one item, each with its own lock, so concurrent decrements rarely wait on each other."""
+
+    def __init__(self, item_id: int, amounts: list[int]):
+        self.item_id = item_id
+        self.slots = [_Slot(amount) for amount in amounts]
+        # set by disable(), takes fail with None afterwards
+        self.closed = False
+        self.spills = 0
+        # shard total of the last change log entry, rebalancing alone does not log a change
+        self.logged_total = self.total()
+
+    @contextmanager
+    def exclusive(self):
+        # always in shard order, takes hold at most one slot lock otherwise, so this cannot deadlock
+        for slot in self.slots:
+            slot.lock.acquire()
+        try:
+            yield
+        finally:
+            for slot in reversed(self.slots):
+                slot.lock.release()
+
+    def total(self) -> int:
+        return sum(slot.amount for slot in self.slots)
+
+    def take(self, amount: int) -> bool | None:
+        """Take amount from a random shard, spilling over to the others when it runs dry.
+        Returns False when all shards together do not have enough, None when the item is no longer hot."""
+        start = random.randrange(len(self.slots))
+        slot = self.slots[start]
+        with slot.lock:
+            if self.closed:
+                return None
+            if slot.amount >= amount:
+                slot.amount -= amount
+                slot.dirty = True
+                return True
+
+        with self.exclusive():
+            if self.closed:
+                return None
+            if self.total() < amount:
+                return False
+            self.spills += 1
+            remaining = amount
+            for offset in range(len(self.slots)):
+                slot = self.slots[(start + offset) % len(self.slots)]
+                used = min(slot.amount, remaining)
+                if used:
+                    slot.amount -= used
+                    slot.dirty = True
+                    remaining -= used
+                if not remaining:
+                    return True
+
+    def put(self, amount: int) -> None:
+        with self.exclusive():
+            slot = min(self.slots, key=lambda slot: slot.amount)
+            slot.amount += amount
+            slot.dirty = True
+
+    def rebalance(self) -> bool:
+        """Spread the total evenly over the shards. Returns False when they were already even."""
+        with self.exclusive():
+            amounts = [slot.amount for slot in self.slots]
+            if max(amounts) - min(amounts) <= 1:
+                return False
+            for slot, amount in zip(self.slots, _split(sum(amounts), len(self.slots))):
+                if slot.amount != amount:
+                    slot.amount = amount
+                    slot.dirty = True
+            return True
+
+
+class HotItems:
+    """Sharded counters for items flagged as hot (StockItem.is_hot).
+
+    A hot item's available stock is split over N stock_shards rows and mirrored in memory,
+    one lock per shard. Decrements pick a random shard, spill over to the others when it
+    runs dry and never touch SQLite; a background thread writes changed shards every
+    HOT_FLUSH_INTERVAL seconds, evens the shards out and moves stock that shows up on the
+    row (released holds, updates) into them every HOT_REBALANCE_INTERVAL seconds.
+    Decrements that are recorded elsewhere (a reservation_id, a hold) are written through
+    in the caller's transaction inside durable(), so a crash cannot hand their units out again.
+    The on-hand total of a hot item is StockItem.amount plus the sum of its shards.
+    """
+
+    def __init__(
+        self,
+        lock_path: str = HOT_ITEMS_LOCK_PATH,
+        flush_interval: float = HOT_FLUSH_INTERVAL,
+        rebalance_interval: float = HOT_REBALANCE_INTERVAL,
+    ):
+        self.lock_path = lock_path
+        self.flush_interval = flush_interval
+        self.rebalance_interval = rebalance_interval
+        self.running = False
+        self._items: dict[int, _HotItem] = {}
+        # held around every write of stock_shards, always taken before a DB connection
+        self._flush_lock = threading.Lock()
+        self._process_lock = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._session_factory: sessionmaker | None = None
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.rebalances = 0
+        self.absorbed = 0
+
+    # lifecycle
+
+    def start(self, session_factory: sessionmaker) -> None:
+        """Load the shards of all hot items and start the flush / rebalance thread."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+        self._process_lock = open(self.lock_path, "w")
+        try:
+            fcntl.flock(self._process_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise RuntimeError("HOT_ITEMS needs a single worker process, the lock is held by another one")
+
+        self._session_factory = session_factory
+        shards: dict[int, list[int]] = {}
+        with session_factory() as db:
+            rows = db.execute(
+                select(_shards.c.item_id, _shards.c.amount)
+                .join(_items, _items.c.id == _shards.c.item_id)
+                .where(_items.c.is_hot)
+                .order_by(_shards.c.item_id, _shards.c.shard)
+            ).all()
+        for item_id, amount in rows:
+            shards.setdefault(item_id, []).append(amount)
+        self._items = {item_id: _HotItem(item_id, amounts) for item_id, amounts in shards.items()}
+        self.running = True
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stock-hot-items", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread and write the shards that are still pending."""
+        if not self.running:
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        self.running = False
+        fcntl.flock(self._process_lock, fcntl.LOCK_UN)
+        self._process_lock.close()
+
+    @staticmethod
+    def fold_all(session_factory: sessionmaker) -> int:
+        """Move the shards of all hot items back into their rows. Used on start when hot items are off,
+        so their stock is not stuck in shards nobody serves. Returns the number of items."""
+        shard_sum = (
+            select(func.coalesce(func.sum(_shards.c.amount), 0))
+            .where(_shards.c.item_id == _items.c.id)
+            .scalar_subquery()
+        )
+        with session_factory() as db:
+            folded = db.execute(
+                update(_items).where(_items.c.is_hot).values(amount=_items.c.amount + shard_sum, is_hot=False)
+            ).rowcount
+            db.execute(delete(_shards))
+            db.commit()
+        if folded:
+            logger.warning("HOT_ITEMS is off, moved the shards of %s hot items back into their rows", folded)
+        return folded
+
+    def _run(self) -> None:
+        last_rebalance = time.monotonic()
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                if time.monotonic() - last_rebalance >= self.rebalance_interval:
+                    last_rebalance = time.monotonic()
+                    self.rebalance()
+            except Exception:
+                logger.exception("Hot item flush failed")
+
+    # reads
+
+    def is_hot(self, item_id: int) -> bool:
+        return item_id in self._items
+
+    def split(self, requested: dict[int, int]) -> tuple[dict[int, int], dict[int, int]]:
+        """Split requested amounts into (hot lines, other lines)."""
+        if not self._items:
+            return {}, requested
+        hot = {item_id: amount for item_id, amount in requested.items() if item_id in self._items}
+        return hot, {item_id: amount for item_id, amount in requested.items() if item_id not in hot}
+
+    def add_available(self, stock: dict[int, int]) -> dict[int, int]:
+        """Add the shard totals to available amounts read from the rows."""
+        for item_id in stock:
+            hot = self._items.get(item_id)
+            if hot is not None:
+                stock[item_id] += hot.total()
+        return stock
+
+    def overlay(self, items: list[StockItem]) -> list[StockItem]:
+        """Add the shard totals to the amounts of freshly loaded items, without marking them dirty."""
+        if self._items:
+            for item in items:
+                hot = self._items.get(item.id)
+                if hot is not None:
+                    set_committed_value(item, "amount", item.amount + hot.total())
+        return items
+
+    # stock operations
+
+    def decrease(self, requested: dict[int, int]) -> tuple[list[int], list[int], dict[int, int]]:
+        """Decrease every hot line that has enough stock.
+        Returns (decreased ids, ids without enough stock, the lines that are not hot)."""
+        hot, rest = self.split(requested)
+        decreased, short = [], []
+        for item_id, amount in hot.items():
+            taken = self._items[item_id].take(amount)
+            if taken is None:
+                rest[item_id] = amount
+            else:
+                (decreased if taken else short).append(item_id)
+        return decreased, short, rest
+
+    def take_all(self, requested: dict[int, int]) -> bool | None:
+        """All-or-nothing decrease of hot lines. None means an item stopped being hot, split again and retry."""
+        taken: dict[int, int] = {}
+        for item_id, amount in requested.items():
+            hot = self._items.get(item_id)
+            result = hot.take(amount) if hot is not None else None
+            if not result:
+                for done_id, done_amount in taken.items():
+                    self._items[done_id].put(done_amount)
+                return result
+            taken[item_id] = amount
+        return True
+
+    def give_back(self, taken: dict[int, int]) -> None:
+        """Put back units taken for a transaction that did not commit.
+        An item disabled meanwhile already folded its shards into the row, its units are lost instead of sold twice."""
+        for item_id, amount in taken.items():
+            hot = self._items.get(item_id)
+            if hot is not None:
+                hot.put(amount)
+
+    @contextmanager
+    def durable(self, needed: bool = True):
+        """Hold the flush lock around a transaction that calls write_through.
+        Enter it before the transaction's first write (lock order). The flush cannot write older shard
+        amounts over the ones written through meanwhile, and no item turns hot or cold."""
+        if not (needed and self.running):
+            yield
+            return
+        with self._flush_lock:
+            yield
+
+    def write_through(self, item_ids, db: Session) -> None:
+        """Write the current shards of hot items in the caller's transaction, inside durable(),
+        so a decrement is committed together with the reservation or hold that records it.
+        The slots stay dirty, the next flush writes them again and logs the change."""
+        params = []
+        for item_id in item_ids:
+            hot = self._items.get(item_id)
+            if hot is None:
+                continue
+            for shard, slot in enumerate(hot.slots):
+                with slot.lock:
+                    params.append({"b_item": item_id, "b_shard": shard, "b_amount": slot.amount})
+        if params:
+            db.execute(_set_shard_stmt, params)
+
+    def reset(self, item_ids, db: Session) -> None:
+        """Empty the shards of hot items whose on-hand amount is about to be overwritten on the row.
+        Runs in the caller's transaction and must come before its other writes (lock order)."""
+        hot_ids = [item_id for item_id in item_ids if item_id in self._items]
+        if not hot_ids:
+            return
+        with self._flush_lock:
+            for item_id in hot_ids:
+                with self._items[item_id].exclusive():
+                    for slot in self._items[item_id].slots:
+                        slot.amount = 0
+                        slot.dirty = False
+            db.execute(update(_shards).where(_shards.c.item_id.in_(hot_ids)).values(amount=0))
+
+    # hot flag
+
+    def enable(self, item_id: int, db: Session, shards: int = HOT_ITEM_SHARDS) -> dict | None:
+        """Flag an item as hot and move its available stock into shards. Returns None if the item does not exist."""
+        with self._flush_lock:
+            if item_id not in self._items:
+                # the write first, so the amounts below are read inside the write transaction
+                if not db.execute(update(_items).where(_items.c.id == item_id).values(is_hot=True)).rowcount:
+                    db.rollback()
+                    return None
+                amount, held = db.execute(select(_items.c.amount, _items.c.held).where(_items.c.id == item_id)).one()
+                available = max(amount - held, 0)
+                amounts = _split(available, shards)
+                db.execute(update(_items).where(_items.c.id == item_id).values(amount=amount - available))
+                db.execute(delete(_shards).where(_shards.c.item_id == item_id))
+                db.execute(insert(_shards), [
+                    {"item_id": item_id, "shard": shard, "amount": shard_amount}
+                    for shard, shard_amount in enumerate(amounts)
+                ])
+                db.commit()
+                self._items[item_id] = _HotItem(item_id, amounts)
+        return self.describe(item_id, db)
+
+    def disable(self, item_id: int, db: Session) -> dict | None:
+        """Move a hot item's shards back into its row. Returns None if the item is not hot."""
+        with self._flush_lock:
+            hot = self._items.get(item_id)
+            if hot is None:
+                return None
+            with hot.exclusive():
+                hot.closed = True
+                total = hot.total()
+            try:
+                db.execute(
+                    update(_items).where(_items.c.id == item_id).values(amount=_items.c.amount + total, is_hot=False)
+                )
+                db.execute(delete(_shards).where(_shards.c.item_id == item_id))
+                db.commit()
+            except Exception:
+                hot.closed = False
+                raise
+            del self._items[item_id]
+        return self.describe(item_id, db)
+
+    def describe(self, item_id: int, db: Session) -> dict | None:
+        row = db.execute(select(_items.c.amount).where(_items.c.id == item_id)).first()
+        if row is None:
+            return None
+        hot = self._items.get(item_id)
+        return {
+            "id": item_id,
+            "hot": hot is not None,
+            "shards": [slot.amount for slot in hot.slots] if hot is not None else [],
+            "amount": row.amount + (hot.total() if hot is not None else 0),
+        }
+
+    # background work
+
+    def flush(self) -> int:
+        """Write changed shards to SQLite. Returns the number of rows written."""
+        with self._flush_lock:
+            pending = []
+            totals: dict[_HotItem, int] = {}
+            for hot in list(self._items.values()):
+                total = 0
+                for shard, slot in enumerate(hot.slots):
+                    with slot.lock:
+                        total += slot.amount
+                        if slot.dirty:
+                            slot.dirty = False
+                            pending.append((hot, shard, slot.amount))
+                if total != hot.logged_total:
+                    totals[hot] = total
+            if not pending:
+                return 0
+            try:
+                with self._session_factory() as db:
+                    db.execute(_set_shard_stmt, [
+                        {"b_item": hot.item_id, "b_shard": shard, "b_amount": amount} for hot, shard, amount in pending
+                    ])
+                    changes = record_changes(db, (hot.item_id for hot in totals), "sync")
+                    alerts = self._crossings(totals, db)
+                    db.commit()
+            except Exception:
+                for hot, shard, _ in pending:
+                    hot.slots[shard].dirty = True
+                raise
+            for hot, total in totals.items():
+                hot.logged_total = total
+        change_broadcaster.publish(changes)
+        low_stock_queue.publish(alerts)
+        self.flushes += 1
+        self.flushed_rows += len(pending)
+        return len(pending)
+
+    @staticmethod
+    def _crossings(totals: dict[_HotItem, int], db: Session) -> list[dict]:
+        """Threshold crossings between the last logged and the new shard totals."""
+        if not totals:
+            return []
+        by_id = {hot.item_id: (hot, total) for hot, total in totals.items()}
+        rows = db.execute(
+            select(_items.c.id, _items.c.amount, _items.c.reorder_threshold)
+            .where(_items.c.id.in_(list(by_id)), _items.c.reorder_threshold.is_not(None))
+        ).all()
+        return crossings((
+            (item_id, amount + by_id[item_id][0].logged_total, amount + by_id[item_id][1], threshold)
+            for item_id, amount, threshold in rows
+        ), "sync")
+
+    def rebalance(self) -> int:
+        """Even out the shards of every hot item and move spare row stock into them.
+        Returns the number of items that changed."""
+        changed = sum(1 for hot in list(self._items.values()) if hot.rebalance())
+        self.rebalances += changed
+        with self._flush_lock:
+            with self._session_factory() as db:
+                spare = {
+                    item_id: amount
+                    for item_id, amount in db.execute(
+                        select(_items.c.id, _items.c.amount - _items.c.held)
+                        .where(_items.c.is_hot, _items.c.amount > _items.c.held)
+                    ).all()
+                    if item_id in self._items
+                }
+                if not spare:
+                    return changed
+                result = db.execute(_absorb_stmt, [{"b_id": item_id, "b_amount": amount} for item_id, amount in spare.items()])
+                if result.rowcount != len(spare):
+                    # a hold took some of it meanwhile, try again next round
+                    db.rollback()
+                    return changed
+                db.commit()
+            # after the commit: a crash in between loses the units instead of selling them twice
+            for item_id, amount in spare.items():
+                self._items[item_id].put(amount)
+            self.absorbed += sum(spare.values())
+        return changed + len(spare)
+
+    def stats(self) -> dict:
+        return {
+            "items": len(self._items),
+            "spills": sum(hot.spills for hot in self._items.values()),
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "rebalances": self.rebalances,
+            "absorbed": self.absorbed,
+        }
+
+
+hot_items = HotItems()
+
+
+def hot_items_enabled() -> bool:
+    return hot_items.running
@@ -0,0 +1,76 @@
+import logging
+import os
+import queue
+from datetime import datetime, timezone
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.model.stock_model import StockItem
+
+logger = logging.getLogger(__name__)
+
+LOW_STOCK_QUEUE_SIZE = int(os.getenv("LOW_STOCK_QUEUE_SIZE", "10000"))
+
+# matches the partial index ix_stock_items_low, only items with a threshold are in it
+is_low = StockItem.amount <= StockItem.reorder_threshold
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def find_crossings(decrements: dict[int, int], db: Session, op: str) -> list[dict]:
+    """Items that a just applied decrement took from above their threshold to at or below it.
+    Call inside the transaction that applied the decrements, publish the result after the commit.
+    """
+    if not decrements:
+        return []
+    rows = db.execute(
+        select(StockItem.id, StockItem.amount, StockItem.reorder_threshold)
+        .where(StockItem.id.in_(list(decrements)), is_low)
+    ).all()
+    return crossings(((item_id, amount + decrements[item_id], amount, threshold) for item_id, amount, threshold in rows), op)
+
+
+def crossings(rows, op: str) -> list[dict]:
+    """Alerts for (item id, previous amount, new amount, threshold) rows that crossed the threshold."""
+    now = utcnow()
+    return [
+        {"item_id": item_id, "amount": amount, "threshold": threshold, "op": op, "created_at": now}
+        for item_id, previous, amount, threshold in rows
+        if threshold is not None and previous > threshold >= amount
+    ]
+
+
+class LowStockQueue:
+    """In-process queue of threshold crossings. Writers never block: when nobody drains it
+    and it is full, new alerts are dropped and counted, GET /stock/low still has them all."""
+
+    def __init__(self, maxsize: int = LOW_STOCK_QUEUE_SIZE):
+        self._queue: queue.Queue[dict] = queue.Queue(maxsize)
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, alerts: list[dict]) -> None:
+        for alert in alerts:
+            logger.warning("Low stock: item %s at %s (threshold %s)", alert["item_id"], alert["amount"], alert["threshold"])
+            try:
+                self._queue.put_nowait(alert)
+                self.published += 1
+            except queue.Full:
+                self.dropped += 1
+
+    def drain(self, limit: int) -> list[dict]:
+        """Take up to limit pending alerts without waiting."""
+        alerts = []
+        while len(alerts) < limit:
+            try:
+                alerts.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return alerts
+
+    def stats(self) -> dict:
+        return {"pending": self._queue.qsize(), "published": self.published, "dropped": self.dropped}
+
+
+low_stock_queue = LowStockQueue()
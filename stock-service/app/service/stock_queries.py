@@ -0,0 +1,23 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.model.stock_model import StockItem
+from app.schema.stock_check_schema import CheckItem
+from app.schema.stock_schema import DecreaseItem
+from app.service.hot_items import hot_items
+
+
+def merge_amounts(items: list[CheckItem] | list[DecreaseItem]) -> dict[int, int]:
+    """Sum requested amounts per item id, keeping the order of first appearance."""
+    requested: dict[int, int] = {}
+    for req_item in items:
+        requested[req_item.id] = requested.get(req_item.id, 0) + req_item.amount
+    return requested
+
+
+def fetch_amounts(ids, db: Session) -> dict[int, int]:
+    """Fetch available-to-sell (amount minus held, plus the shards of hot items) for all given ids with a single IN query."""
+    if not ids:
+        return {}
+    return hot_items.add_available(dict(db.execute(
+        select(StockItem.id, StockItem.amount - StockItem.held).where(StockItem.id.in_(list(ids)))
+    ).all()))
@@ -1,11 +1,37 @@
 import logging
+import os
+import re
+from typing import AsyncIterator, Iterator
+from pydantic import TypeAdapter, ValidationError
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import bindparam, column, func, literal_column, select, table, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from app.model.stock_model import StockItem
-from app.schema.stock_check_schema import CheckItem, CheckStockResponse, MissingItem
-from app.schema.stock_schema import DecreaseItem, StockItemCreate
+from app.config.database import SessionLocal
+from app.model.stock_model import StockItem, StockReservation
+from app.schema.stock_check_schema import CheckItem, CheckStockResponse, MissingItem, ReserveStockRequest, ReserveStockResponse
+from app.schema.stock_schema import BulkImportResponse, BulkRowError, BulkStockRow, DecreaseItem, StockItemCreate, StockItemOut
+from app.service.change_feed import change_broadcaster, record_changes
+from app.service.counter_engine import counter_engine, memory_engine_enabled
+from app.service.hot_items import hot_items
+from app.service.low_stock import find_crossings, is_low, low_stock_queue
+from app.service.stock_queries import fetch_amounts, merge_amounts
+from app.util.bulk_reader import BulkFormatError
+from app.util.category_cache import CachedListing, category_cache
 
 logger = logging.getLogger(__name__)
 
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+BULK_MAX_ERRORS = int(os.getenv("BULK_MAX_ERRORS", "1000"))
+
+
+def _overlay(items: list[StockItem]) -> list[StockItem]:
+    """Put the live amounts (memory engine counters or hot item shards) on freshly loaded items."""
+    if memory_engine_enabled():
+        return counter_engine.overlay(items)
+    return hot_items.overlay(items)
+
 
 def get_item_by_id(id: int, db: Session) -> StockItem | None:
     """Get a stock item by its ID.
@@ -16,7 +42,10 @@ def get_item_by_id(id: int, db: Session) -> StockItem | None:
     Returns:
         StockItem | None: The stock item if found, otherwise None.
     """
-    return db.query(StockItem).filter(StockItem.id == id).first()
+    item = db.query(StockItem).filter(StockItem.id == id).first()
+    if item is not None:
+        _overlay([item])
+    return item
 
 def get_all_by_category(category: str, db: Session) -> list[StockItem]:
     """Get all stock items by category.
@@ -27,18 +56,155 @@ def get_all_by_category(category: str, db: Session) -> list[StockItem]:
     Returns:
         list[StockItem]: The list of stock items in the specified category.
     """
-    return db.query(StockItem).filter(StockItem.category == category).all()
+    items = db.query(StockItem).filter(StockItem.category == category).all()
+    return _overlay(items)
 
 
-def get_all_items(db: Session) -> list[StockItem]:
-    """Get all stock items.
+_stock_items_adapter = TypeAdapter(list[StockItemOut])
+
+
+def get_category_listing(category: str, db: Session) -> CachedListing | None:
+    """Get the serialized listing of a category, from the category cache when possible.
     Args:
+        category (str): The category of the stock items to retrieve.
+        db (Session): The database session, only used on a cache miss.
+
+    Returns:
+        CachedListing | None: The JSON body and its ETag, or None if the category has no items.
+    """
+    cached = category_cache.get(category)
+    if cached is not None:
+        return cached
+
+    generation = category_cache.generation()
+    items = get_all_by_category(category, db)
+    if not items:
+        return None
+    body = _stock_items_adapter.dump_json(_stock_items_adapter.validate_python(items, from_attributes=True))
+    return category_cache.put(category, body, (item.id for item in items), generation)
+
+
+_search_index = table("stock_items_fts", column("rowid"))
+_search_match = literal_column("stock_items_fts")
+_search_terms = re.compile(r"\w+")
+SEARCH_MAX_TERMS = 10
+
+
+def _search_query(q: str) -> str | None:
+    """Turn user input into an FTS5 query: every word is quoted (no FTS syntax from outside) and matched as a prefix."""
+    terms = _search_terms.findall(q)[:SEARCH_MAX_TERMS]
+    return " ".join(f'"{term}"*' for term in terms) or None
+
+
+def search_items(q: str, db: Session, limit: int = 20) -> list[StockItem]:
+    """Full-text search over item names and categories, best matches first.
+    Args:
+        q (str): The search text, every word matches as a prefix ("choc bar" finds "Chocolate Bar").
         db (Session): The database session.
+        limit (int): Maximum number of items.
 
     Returns:
-        list[StockItem]: The list of all stock items.
+        list[StockItem]: The matching items ranked by bm25, names weighted over categories.
+    """
+    match = _search_query(q)
+    if match is None:
+        return []
+    rank = func.bm25(_search_match, literal_column("2.0"), literal_column("1.0")).label("rank")
+    # the best matches are picked inside the FTS query, the join only loads those rows
+    candidates = (
+        select(_search_index.c.rowid.label("id"), rank)
+        .where(_search_match.op("MATCH")(match))
+        .order_by(rank, _search_index.c.rowid)
+        .limit(limit)
+        .subquery()
+    )
+    items = db.execute(
+        select(StockItem).join(candidates, StockItem.id == candidates.c.id).order_by(candidates.c.rank, StockItem.id).limit(limit)
+    ).scalars().all()
+    return _overlay(list(items))
+
+
+STREAM_BATCH_SIZE = 500
+
+
+def _all_items_query(after_id: int | None = None):
+    """All items in primary key order, starting after the given id (keyset pagination)."""
+    query = select(StockItem).order_by(StockItem.id)
+    if after_id is not None:
+        query = query.where(StockItem.id > after_id)
+    return query
+
+
+def get_all_items(db: Session, limit: int = 100, after_id: int | None = None) -> dict:
+    """Get one page of stock items.
+    Args:
+        db (Session): The database session.
+        limit (int): Maximum number of items on the page.
+        after_id (int | None): Return items with an id greater than this one.
+
+    Returns:
+        dict: The page "items" and "next_after_id", which is None on the last page.
+    """
+    items = db.execute(_all_items_query(after_id).limit(limit + 1)).scalars().all()
+    next_after_id = items[limit - 1].id if len(items) > limit else None
+    items = _overlay(items[:limit])
+    return {"items": items, "next_after_id": next_after_id}
+
+
+def get_low_stock_items(db: Session, limit: int = 100, after_id: int | None = None) -> dict:
+    """Get one page of items at or below their reorder threshold, through the partial index ix_stock_items_low.
+    Args:
+        db (Session): The database session.
+        limit (int): Maximum number of rows read for the page.
+        after_id (int | None): Return items with an id greater than this one.
+
+    Returns:
+        dict: The page "items" and "next_after_id", which is None on the last page.
+    """
+    query = select(StockItem).where(is_low).order_by(StockItem.id)
+    if after_id is not None:
+        query = query.where(StockItem.id > after_id)
+    items = db.execute(query.limit(limit + 1)).scalars().all()
+    next_after_id = items[limit - 1].id if len(items) > limit else None
+    # a hot item's row holds only part of its stock, so its row can be low while the live total is not
+    items = [item for item in _overlay(items[:limit]) if item.amount <= item.reorder_threshold]
+    return {"items": items, "next_after_id": next_after_id}
+
+
+def stream_all_items(after_id: int | None = None) -> Iterator[str]:
+    """Stream all stock items as NDJSON lines, reading the table STREAM_BATCH_SIZE rows at a time.
+    The generator opens its own session so it outlives the request scope.
+    """
+    with SessionLocal() as session:
+        result = session.execute(_all_items_query(after_id).execution_options(yield_per=STREAM_BATCH_SIZE))
+        for partition in result.scalars().partitions():
+            _overlay(partition)
+            yield "".join(StockItemOut.model_validate(item, from_attributes=True).model_dump_json() + "\n" for item in partition)
+
+
+# Conditional decrement, executed as one executemany over all order lines
+_decrement_stmt = (
+    update(StockItem.__table__)
+    .where(StockItem.__table__.c.id == bindparam("b_id"))
+    .where(StockItem.__table__.c.amount - StockItem.__table__.c.held >= bindparam("b_amount"))
+    .values(amount=StockItem.__table__.c.amount - bindparam("b_amount"))
+)
+
+DECREMENT_RETRIES = 3
+
+
+def _apply_decrements(plan: dict[int, int], db: Session) -> bool:
+    """Run the conditional bulk UPDATE for all lines in the plan.
+    Returns False when fewer rows were affected than planned, which means
+    another writer took the stock after it was read.
     """
-    return db.query(StockItem).all()
+    if not plan:
+        return True
+    result = db.execute(
+        _decrement_stmt,
+        [{"b_id": item_id, "b_amount": amount} for item_id, amount in plan.items()]
+    )
+    return result.rowcount == len(plan)
 
 
 def check_stock_availability(items: list[CheckItem], db: Session) -> CheckStockResponse:
@@ -50,15 +216,13 @@ def check_stock_availability(items: list[CheckItem], db: Session) -> CheckStockR
     Returns:
         CheckStockResponse: The response containing the availability status and missing items.
     """
-    missing = []
-    for req_item in items:
-        stock = db.query(StockItem).filter(StockItem.id == req_item.id).first()
-        if not stock or stock.amount < req_item.amount:
-            missing.append(MissingItem(
-                id=req_item.id,
-                requested=req_item.amount,
-                available=stock.amount if stock else 0
-            ))
+    requested = merge_amounts(items)
+    stock = counter_engine.amounts(requested) if memory_engine_enabled() else fetch_amounts(requested, db)
+    missing = [
+        MissingItem(id=item_id, requested=amount, available=stock.get(item_id, 0))
+        for item_id, amount in requested.items()
+        if stock.get(item_id, 0) < amount
+    ]
     return CheckStockResponse(
         available=len(missing) == 0,
         missing=missing
@@ -70,21 +234,195 @@ def decrease_stock(items: list[DecreaseItem], db: Session) -> dict:
     """Decrease stock items by id and amount.
     Returns a dictionary with success status, decreased item ids, and not found item ids.
     """
-    decreased = []
-    not_found = []
-    for req_item in items:
-        stock = db.query(StockItem).filter(StockItem.id == req_item.id).first()
-        if stock and stock.amount >= req_item.amount:
-            stock.amount -= req_item.amount
-            decreased.append(req_item.id)
-        else:
-            not_found.append(req_item.id)
-    db.commit()
-    return {"success": len(not_found) == 0, "decreased": decreased, "not_found": not_found}
+    requested = merge_amounts(items)
+    if memory_engine_enabled():
+        decreased, not_found = counter_engine.decrease(requested)
+        category_cache.invalidate_items(decreased)
+        result = {"success": len(not_found) == 0, "decreased": decreased, "not_found": not_found}
+        if not_found:
+            result["error"] = {"message": "Insufficient stock", "not_found": not_found}
+        return result
+
+    # hot items are decreased in their in-memory shards, the rest with the conditional UPDATE
+    hot_decreased, _, cold = hot_items.decrease(requested)
+    category_cache.invalidate_items(hot_decreased)
+    for _ in range(DECREMENT_RETRIES):
+        stock = fetch_amounts(cold, db)
+        plan = {item_id: amount for item_id, amount in cold.items() if stock.get(item_id, 0) >= amount}
+        if _apply_decrements(plan, db):
+            changes = record_changes(db, plan, "decrease")
+            alerts = find_crossings(plan, db, "decrease")
+            db.commit()
+            change_broadcaster.publish(changes)
+            low_stock_queue.publish(alerts)
+            category_cache.invalidate_items(plan)
+            decreased = [item_id for item_id in requested if item_id in plan or item_id in hot_decreased]
+            not_found = [item_id for item_id in requested if item_id not in decreased]
+            result = {"success": len(not_found) == 0, "decreased": decreased, "not_found": not_found}
+            if not_found:
+                result["error"] = {"message": "Insufficient stock", "not_found": not_found}
+            return result
+        db.rollback()
+
+    logger.error("Stock decrease kept conflicting with concurrent writers: ids=%s", list(cold))
+    not_found = [item_id for item_id in requested if item_id not in hot_decreased]
+    return {
+        "success": False,
+        "decreased": hot_decreased,
+        "not_found": not_found,
+        "error": {"message": "Concurrent update conflict", "not_found": not_found},
+    }
+
+
+def _reserve_group(
+    requested: dict[int, int],
+    db: Session,
+    reservation_id: str | None = None,
+    alerts: list[dict] | None = None,
+    taken: dict[int, int] | None = None,
+) -> tuple[ReserveStockResponse, bool]:
+    """Reserve one order's lines inside a SAVEPOINT of the current transaction.
+    Either every line is decremented or the savepoint is rolled back and the shortfall is returned.
+    A reservation_id that was already applied returns the stored success without decrementing again.
+    Low stock crossings are appended to alerts, to be published after the commit.
+    Hot units are added to taken, for the caller to give back if the commit fails. With a reservation_id
+    their shards are written in this transaction, the caller must be inside hot_items.durable().
+    Returns the result and whether it is a replay, so the caller does not log the lines again.
+    """
+    if memory_engine_enabled():
+        reserved, stock = counter_engine.reserve(requested, reservation_id, db)
+        if reserved:
+            return ReserveStockResponse(success=True, reserved=list(requested)), False
+        return ReserveStockResponse(success=False, missing=[
+            MissingItem(id=item_id, requested=amount, available=stock[item_id])
+            for item_id, amount in requested.items()
+            if stock[item_id] < amount
+        ]), False
+
+    if reservation_id is not None:
+        applied = db.get(StockReservation, reservation_id)
+        if applied is not None:
+            return ReserveStockResponse(success=True, reserved=applied.item_ids), True
+
+    stock: dict[int, int] = {}
+    hot, cold = hot_items.split(requested)
+    for _ in range(DECREMENT_RETRIES):
+        savepoint = db.begin_nested()
+        if _apply_decrements(cold, db):
+            if reservation_id is not None:
+                try:
+                    db.add(StockReservation(id=reservation_id, item_ids=list(requested)))
+                    db.flush()
+                except IntegrityError:
+                    # a concurrent call with the same reservation_id won, undo our copy
+                    savepoint.rollback()
+                    return ReserveStockResponse(success=True, reserved=list(requested)), True
+            # hot lines last, so a short cold line does not have to give them back
+            if hot_items.take_all(hot):
+                if taken is not None:
+                    for item_id, amount in hot.items():
+                        taken[item_id] = taken.get(item_id, 0) + amount
+                if reservation_id is not None:
+                    hot_items.write_through(hot, db)
+                if alerts is not None:
+                    alerts.extend(find_crossings(cold, db, "reserve"))
+                savepoint.commit()
+                return ReserveStockResponse(success=True, reserved=list(requested)), False
+        savepoint.rollback()
+        # an item may have stopped being hot meanwhile
+        hot, cold = hot_items.split(requested)
+
+        stock = fetch_amounts(requested, db)
+        missing = [
+            MissingItem(id=item_id, requested=amount, available=stock.get(item_id, 0))
+            for item_id, amount in requested.items()
+            if stock.get(item_id, 0) < amount
+        ]
+        if missing:
+            return ReserveStockResponse(success=False, missing=missing), False
 
+    logger.error("Stock reservation kept conflicting with concurrent writers: ids=%s", list(requested))
+    return ReserveStockResponse(
+        success=False,
+        missing=[
+            MissingItem(id=item_id, requested=amount, available=stock.get(item_id, 0))
+            for item_id, amount in requested.items()
+        ]
+    ), False
+
+
+def reserve_stock(items: list[CheckItem], db: Session, reservation_id: str | None = None) -> ReserveStockResponse:
+    """Atomically check and decrease all items of one order.
+    Every line is decremented with a conditional UPDATE inside a single transaction,
+    so either all lines are reserved or nothing changes.
+    Args:
+        items (list[CheckItem]): The order lines to reserve.
+        db (Session): The database session.
+        reservation_id (str | None): Optional idempotency key of the reservation.
+
+    Returns:
+        ReserveStockResponse: Reserved item ids on success, otherwise the per-item shortfall.
+    """
+    alerts: list[dict] = []
+    taken: dict[int, int] = {}
+    with hot_items.durable(reservation_id is not None):
+        try:
+            result, replayed = _reserve_group(merge_amounts(items), db, reservation_id, alerts, taken)
+            # hot items are logged when their shards are flushed, a replay changed nothing
+            logged = [] if replayed else [item_id for item_id in result.reserved if not hot_items.is_hot(item_id)]
+            changes = [] if memory_engine_enabled() else record_changes(db, logged, "reserve")
+            db.commit()
+        except Exception:
+            hot_items.give_back(taken)
+            raise
+    change_broadcaster.publish(changes)
+    low_stock_queue.publish(alerts)
+    category_cache.invalidate_items(result.reserved)
+    return result
+
+
+def reserve_stock_batch(orders: list[ReserveStockRequest], db: Session) -> list[ReserveStockResponse]:
+    """Reserve stock for many orders in one transaction.
+    Each order is all-or-nothing on its own (one savepoint per order), a failed order
+    does not undo the orders reserved before or after it.
+    Args:
+        orders (list[ReserveStockRequest]): The lines and optional reservation id of each order.
+        db (Session): The database session.
 
-def increase_one_stock(id: int, name: str, category: str, amount: int, db: Session) -> dict:
-    """Update a single stock item by id. Sets name, category, and amount.
+    Returns:
+        list[ReserveStockResponse]: One result per order, in the same order.
+    """
+    alerts: list[dict] = []
+    taken: dict[int, int] = {}
+    with hot_items.durable(any(order.reservation_id is not None for order in orders)):
+        try:
+            outcomes = [
+                _reserve_group(merge_amounts(order.items), db, order.reservation_id, alerts, taken)
+                for order in orders
+            ]
+            # hot items are logged when their shards are flushed, a replay changed nothing
+            logged = [
+                item_id
+                for result, replayed in outcomes if not replayed
+                for item_id in result.reserved if not hot_items.is_hot(item_id)
+            ]
+            changes = [] if memory_engine_enabled() else record_changes(db, logged, "reserve")
+            db.commit()
+        except Exception:
+            hot_items.give_back(taken)
+            raise
+    results = [result for result, _ in outcomes]
+    reserved = [item_id for result in results for item_id in result.reserved]
+    change_broadcaster.publish(changes)
+    low_stock_queue.publish(alerts)
+    category_cache.invalidate_items(reserved)
+    return results
+
+
+def increase_one_stock(
+    id: int, name: str, category: str, amount: int, db: Session, reorder_threshold: int | None = None
+) -> dict:
+    """Update a single stock item by id. Sets name, category, and amount, and the reorder threshold if given.
     Logs an error if the item does not exist.
     """
     stock = db.query(StockItem).filter(StockItem.id == id).first()
@@ -92,17 +430,29 @@ def increase_one_stock(id: int, name: str, category: str, amount: int, db: Sessi
         logger.error("Item not found: id=%s, name=%s, category=%s", id, name, category)
         return {"success": False, "error": "Item not found"}
 
+    # the new amount is the on-hand total, a hot item's shards start over from zero
+    hot_items.reset([id], db)
+    previous_category = stock.category
     stock.name = name
     stock.category = category
     stock.amount = amount
+    if reorder_threshold is not None:
+        stock.reorder_threshold = reorder_threshold
+    db.flush()
+    changes = record_changes(db, [stock.id], "update")
     db.commit()
+    change_broadcaster.publish(changes)
+    category_cache.invalidate_categories({previous_category, category})
     db.refresh(stock)
+    if memory_engine_enabled():
+        counter_engine.track({stock.id: amount})
     return {
         "success": True,
         "id": stock.id,
         "category": stock.category,
         "name": stock.name,
         "amount": stock.amount,
+        "reorder_threshold": stock.reorder_threshold,
     }
 
 
@@ -118,11 +468,109 @@ def create_stock_item(item_data: StockItemCreate, db: Session) -> StockItem:
     new_item = StockItem(
         category=item_data.category,
         name=item_data.name,
-        amount=item_data.amount
+        amount=item_data.amount,
+        reorder_threshold=item_data.reorder_threshold
     )
     db.add(new_item)
+    db.flush()
+    changes = record_changes(db, [new_item.id], "create")
     db.commit()
+    change_broadcaster.publish(changes)
+    category_cache.invalidate_categories([new_item.category])
     db.refresh(new_item)
+    if memory_engine_enabled():
+        counter_engine.track({new_item.id: new_item.amount})
     return new_item
 
 
+def bulk_upsert_items(rows: list[BulkStockRow], db: Session) -> tuple[int, int]:
+    """Insert or update one chunk of stock items in a single transaction.
+    Rows with an id are upserted on that id (INSERT ... ON CONFLICT DO UPDATE), rows without one are inserted.
+    Args:
+        rows (list[BulkStockRow]): The validated rows of the chunk.
+        db (Session): The database session.
+
+    Returns:
+        tuple[int, int]: The number of inserted and updated rows.
+    """
+    table = StockItem.__table__
+    with_id = [row.model_dump() for row in rows if row.id is not None]
+    new = [row.model_dump(exclude={"id"}) for row in rows if row.id is None]
+    existing = dict(db.execute(
+        select(StockItem.id, StockItem.category).where(StockItem.id.in_({row["id"] for row in with_id}))
+    ).all()) if with_id else {}
+
+    amounts: dict[int, int] = {}
+    hot_items.reset(existing, db)
+    if with_id:
+        upsert = sqlite_insert(table)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={
+                "category": upsert.excluded.category,
+                "name": upsert.excluded.name,
+                "amount": upsert.excluded.amount,
+                # an empty threshold column keeps the current one
+                "reorder_threshold": func.coalesce(upsert.excluded.reorder_threshold, table.c.reorder_threshold),
+            },
+        )
+        amounts.update(db.execute(upsert.returning(table.c.id, table.c.amount), with_id).all())
+    if new:
+        amounts.update(db.execute(sqlite_insert(table).returning(table.c.id, table.c.amount), new).all())
+    changes = record_changes(db, amounts, "bulk")
+    db.commit()
+    change_broadcaster.publish(changes)
+
+    category_cache.invalidate_categories({row.category for row in rows} | set(existing.values()))
+    if memory_engine_enabled():
+        counter_engine.track(amounts)
+    # replay the upsert: the first row of an id that did not exist inserts it, later rows update it
+    updated, seen = 0, set(existing)
+    for row in with_id:
+        if row["id"] in seen:
+            updated += 1
+        seen.add(row["id"])
+    return len(rows) - updated, updated
+
+
+async def import_stock_items(rows: AsyncIterator[tuple[int, dict | str]], db: Session) -> BulkImportResponse:
+    """Validate and upsert a stream of parsed rows, BULK_CHUNK_SIZE rows per transaction.
+    Invalid rows are reported and skipped, a BulkFormatError stops the import after the chunks already committed.
+    Args:
+        rows (AsyncIterator[tuple[int, dict | str]]): (line number, row or parse error) pairs from app.util.bulk_reader.
+        db (Session): The database session.
+
+    Returns:
+        BulkImportResponse: Inserted, updated and failed counts with the first BULK_MAX_ERRORS row errors.
+    """
+    result = BulkImportResponse()
+
+    def fail(line: int, error: str) -> None:
+        result.failed += 1
+        if len(result.errors) < BULK_MAX_ERRORS:
+            result.errors.append(BulkRowError(line=line, error=error))
+
+    async def flush(chunk: list[BulkStockRow]) -> None:
+        inserted, updated = await run_in_threadpool(bulk_upsert_items, chunk, db)
+        result.inserted += inserted
+        result.updated += updated
+
+    chunk: list[BulkStockRow] = []
+    try:
+        async for line, row in rows:
+            if isinstance(row, str):
+                fail(line, row)
+                continue
+            try:
+                chunk.append(BulkStockRow.model_validate(row))
+            except ValidationError as e:
+                fail(line, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+                continue
+            if len(chunk) >= BULK_CHUNK_SIZE:
+                await flush(chunk)
+                chunk = []
+    except BulkFormatError as e:
+        fail(e.line, str(e))
+    if chunk:
+        await flush(chunk)
+    return result
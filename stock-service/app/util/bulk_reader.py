@@ -0,0 +1,62 @@
+import csv
+import json
+from typing import AsyncIterator
+
+# a longer line without a newline is rejected instead of buffering it
+BULK_MAX_LINE_BYTES = 64 * 1024
+_OPTIONAL_COLUMNS = {"id", "reorder_threshold"}
+
+
+class BulkFormatError(Exception):
+    """The body cannot be read any further (bad header, oversized line), the import stops here."""
+
+    def __init__(self, line: int, message: str):
+        super().__init__(message)
+        self.line = line
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, str]]:
+    """Split a byte stream into (line number, text) pairs without reading it whole. Blank lines are skipped."""
+    buffer = b""
+    line_no = 0
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for raw in lines:
+            line_no += 1
+            line = raw.decode("utf-8", errors="replace").strip()
+            if line:
+                yield line_no, line
+        if len(buffer) > BULK_MAX_LINE_BYTES:
+            raise BulkFormatError(line_no + 1, f"Line is longer than {BULK_MAX_LINE_BYTES} bytes")
+    line = buffer.decode("utf-8", errors="replace").strip()
+    if line:
+        yield line_no + 1, line
+
+
+async def iter_ndjson_rows(stream: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, dict | str]]:
+    """Yield (line number, object) per NDJSON line, or (line number, error message) for unparsable lines."""
+    async for line_no, line in iter_lines(stream):
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_no, f"Invalid JSON: {e}"
+            continue
+        yield line_no, row if isinstance(row, dict) else "Expected a JSON object"
+
+
+async def iter_csv_rows(stream: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, dict | str]]:
+    """Yield (line number, row) per CSV line, keyed by the header line. Quoted fields must not contain newlines."""
+    header = None
+    async for line_no, line in iter_lines(stream):
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            if not {"category", "name", "amount"} <= set(header):
+                raise BulkFormatError(line_no, "CSV header must contain category, name and amount (id and reorder_threshold are optional)")
+            continue
+        if len(values) != len(header):
+            yield line_no, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        # empty id column means a new item, empty optional columns are left out
+        yield line_no, {key: value for key, value in zip(header, values) if not (key in _OPTIONAL_COLUMNS and value == "")}
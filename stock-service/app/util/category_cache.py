@@ -0,0 +1,102 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, NamedTuple
+
+# short TTL: invalidation only reaches the worker that handled the write, other workers catch up on expiry
+CATEGORY_CACHE_TTL = float(os.getenv("CATEGORY_CACHE_TTL", "2"))
+CATEGORY_CACHE_SIZE = int(os.getenv("CATEGORY_CACHE_SIZE", "1000"))
+
+
+class CachedListing(NamedTuple):
+    etag: str
+    body: bytes
+    item_ids: frozenset
+    expires_at: float
+
+
+class CategoryCache:
+    """Per-process cache of serialized GET /stock?category= responses.
+
+    Each category has a version that is bumped whenever one of its items changes.
+    The ETag combines that version with a digest of the body, so it also stays
+    unique across workers and restarts. A global generation counter is bumped by
+    every invalidation, and a listing read before a write is not stored after it.
+    """
+
+    def __init__(self, maxsize: int = CATEGORY_CACHE_SIZE, ttl: float = CATEGORY_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, CachedListing] = OrderedDict()
+        self._item_category: dict[int, str] = {}
+        self._versions: dict[str, int] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def generation(self) -> int:
+        """Take this before querying the DB and pass it to put()."""
+        with self._lock:
+            return self._generation
+
+    def get(self, category: str) -> CachedListing | None:
+        with self._lock:
+            entry = self._entries.get(category)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._drop(category)
+                return None
+            self._entries.move_to_end(category)
+            return entry
+
+    def put(self, category: str, body: bytes, item_ids: Iterable[int], generation: int) -> CachedListing:
+        """Cache a serialized listing. It is returned but not stored if anything was invalidated since generation."""
+        with self._lock:
+            version = self._versions.get(category, 0)
+            entry = CachedListing(
+                etag=f'"{version}-{hashlib.sha1(body).hexdigest()[:16]}"',
+                body=body,
+                item_ids=frozenset(item_ids),
+                expires_at=time.monotonic() + self.ttl,
+            )
+            if generation != self._generation or self.maxsize <= 0:
+                return entry
+            self._drop(category)
+            self._entries[category] = entry
+            for item_id in entry.item_ids:
+                self._item_category[item_id] = category
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+            return entry
+
+    def _drop(self, category: str) -> None:
+        entry = self._entries.pop(category, None)
+        if entry is None:
+            return
+        for item_id in entry.item_ids:
+            if self._item_category.get(item_id) == category:
+                del self._item_category[item_id]
+
+    def invalidate_categories(self, categories: Iterable[str]) -> None:
+        with self._lock:
+            self._generation += 1
+            for category in categories:
+                self._versions[category] = self._versions.get(category, 0) + 1
+                self._drop(category)
+
+    def invalidate_items(self, item_ids: Iterable[int]) -> None:
+        """Invalidate the cached categories that contain any of the items."""
+        with self._lock:
+            categories = {self._item_category[item_id] for item_id in item_ids if item_id in self._item_category}
+        self.invalidate_categories(categories)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._item_category.clear()
+
+
+category_cache = CategoryCache()
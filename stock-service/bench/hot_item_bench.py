@@ -0,0 +1,106 @@
+"""Benchmark: many concurrent decrementers against one SKU, plain row vs hot item shards.
+
+THREADS workers call decrease_stock for the same item, one unit per call, until it is sold
+out or DURATION seconds have passed. Reports throughput, p99 latency, units sold and the
+amount left in SQLite after the final flush, which must add up to the starting stock.
+
+Run from the stock-service directory:
+    python bench/hot_item_bench.py
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+DB_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_DIR}/bench.db"
+os.environ["HOT_ITEMS_LOCK_PATH"] = f"{DB_DIR}/hot_items.lock"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config.database import SessionLocal, init_db  # noqa: E402
+from app.model.stock_model import StockItem  # noqa: E402
+from app.schema.stock_schema import DecreaseItem  # noqa: E402
+from app.service.hot_items import hot_items  # noqa: E402
+from app.service.stock_service import decrease_stock, get_item_by_id  # noqa: E402
+
+THREADS = 32
+DURATION = 3.0
+SHARDS = 8
+# (label, starting stock): enough to last the whole run, and a sell-out that must stop at exactly zero
+SCENARIOS = (("long run", 10_000_000), ("sell-out", 5_000))
+
+
+def p99(samples: list[float]) -> float:
+    if not samples:
+        return 0.0
+    samples.sort()
+    return samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000
+
+
+def run(units: int, hot: bool) -> dict:
+    with SessionLocal() as db:
+        item = StockItem(category="bench", name="launch", amount=units)
+        db.add(item)
+        db.commit()
+        item_id = item.id
+        if hot:
+            hot_items.enable(item_id, db, SHARDS)
+
+    latencies: list[float] = []
+    sold = 0
+    sold_out = threading.Event()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + DURATION
+    started = time.perf_counter()
+
+    def worker():
+        nonlocal sold
+        local, local_sold = [], 0
+        line = [DecreaseItem(id=item_id, amount=1)]
+        while not sold_out.is_set() and time.perf_counter() < deadline:
+            start = time.perf_counter()
+            with SessionLocal() as db:
+                result = decrease_stock(line, db)
+            local.append(time.perf_counter() - start)
+            if result["success"]:
+                local_sold += 1
+            else:
+                sold_out.set()
+        with lock:
+            latencies.extend(local)
+            sold += local_sold
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    hot_items.flush()
+    with SessionLocal() as db:
+        left = get_item_by_id(item_id, db).amount
+    return {"ops_s": len(latencies) / elapsed, "p99": p99(latencies), "sold": sold, "left": left, "units": units}
+
+
+def main():
+    init_db()
+    hot_items.start(SessionLocal)
+    try:
+        print(f"{THREADS} threads on one SKU, {SHARDS} shards for the hot item")
+        print(f"{'scenario':>9} | {'mode':>4} | {'ops/s':>8} | {'p99 ms':>7} | {'sold':>8} | {'left':>8} | consistent")
+        for label, units in SCENARIOS:
+            for hot in (False, True):
+                r = run(units, hot)
+                consistent = r["sold"] + r["left"] == r["units"] and r["left"] >= 0
+                print(
+                    f"{label:>9} | {'hot' if hot else 'row':>4} | {r['ops_s']:>8.0f} | {r['p99']:>7.2f} | "
+                    f"{r['sold']:>8} | {r['left']:>8} | {consistent}"
+                )
+    finally:
+        hot_items.stop()
+
+
+if __name__ == "__main__":
+    main()
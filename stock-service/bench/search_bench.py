@@ -0,0 +1,94 @@
+"""Benchmark: /stock/search (FTS5) vs a client-side scan of all items.
+
+Loads CATALOGUE_SIZE items with random three-word names through the normal insert path,
+so the search index is filled by its triggers, then times search_items for a few query
+shapes (whole word, long and short prefixes, two words) against reading every item and
+filtering the names in Python, which is what clients of /stock/all had to do.
+
+Run from the stock-service directory:
+    python bench/search_bench.py [catalogue size]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+DB_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_DIR}/bench.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, select  # noqa: E402
+from app.config.database import SessionLocal, init_db  # noqa: E402
+from app.model.stock_model import StockItem  # noqa: E402
+from app.service.stock_service import search_items  # noqa: E402
+
+CATALOGUE_SIZE = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+VOCABULARY = 20_000
+ROUNDS = 50
+LOAD_CHUNK = 50_000
+
+
+def seed(rng: random.Random) -> list[str]:
+    words = ["".join(rng.choice("abcdefghijklmnoprstuvz") for _ in range(rng.randint(3, 9))) for _ in range(VOCABULARY)]
+    categories = [f"category-{i}" for i in range(200)]
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        for offset in range(0, CATALOGUE_SIZE, LOAD_CHUNK):
+            db.execute(insert(StockItem), [
+                {"category": rng.choice(categories), "name": " ".join(rng.choice(words) for _ in range(3)), "amount": 10}
+                for _ in range(min(LOAD_CHUNK, CATALOGUE_SIZE - offset))
+            ])
+            db.commit()
+    print(f"loaded {CATALOGUE_SIZE} items (with index triggers) in {time.perf_counter() - start:.1f}s")
+    return words
+
+
+def percentiles(samples: list[float]) -> tuple[float, float]:
+    samples.sort()
+    return samples[len(samples) // 2] * 1000, samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000
+
+
+def time_search(q: str) -> tuple[float, float, int]:
+    samples = []
+    found = 0
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        with SessionLocal() as db:
+            found = len(search_items(q, db, 20))
+        samples.append(time.perf_counter() - start)
+    return (*percentiles(samples), found)
+
+
+def time_scan(q: str) -> float:
+    """Read every item and filter by prefix on the client, once."""
+    terms = q.lower().split()
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        names = db.execute(select(StockItem.id, StockItem.name)).all()
+    [
+        item_id for item_id, name in names
+        if all(any(word.startswith(term) for word in name.lower().split()) for term in terms)
+    ][:20]
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    init_db()
+    rng = random.Random(7)
+    words = seed(rng)
+    queries = {
+        "word": words[5],
+        "prefix 4": words[11][:4],
+        "prefix 2": words[17][:2],
+        "prefix 1": words[23][:1],
+        "two words": f"{words[5][:3]} {words[29][:3]}",
+    }
+    print(f"{'query':>10} | {'q':>16} | {'search p50':>10} | {'search p99':>10} | {'hits':>4} | {'scan':>9}   (ms)")
+    for label, q in queries.items():
+        p50, p99, hits = time_search(q)
+        print(f"{label:>10} | {q:>16} | {p50:>10.2f} | {p99:>10.2f} | {hits:>4} | {time_scan(q):>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
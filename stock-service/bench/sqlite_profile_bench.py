@@ -0,0 +1,105 @@
+"""Benchmark: plain vs production SQLite profile under a mixed read/write load.
+
+Runs THREADS workers for DURATION seconds against a fresh database file per profile.
+Each operation is a check_stock_availability (read) or, with WRITE_RATIO probability,
+a decrease_stock (write). Reports throughput, read/write p99 and "database is locked" errors.
+
+Run from the stock-service directory:
+    python bench/sqlite_profile_bench.py
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+DB_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_DIR}/import.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app.config.database import Base  # noqa: E402
+from app.config.sqlite_profile import RoutingSession, create_engines  # noqa: E402
+from app.model.stock_model import StockItem  # noqa: E402
+from app.schema.stock_check_schema import CheckItem  # noqa: E402
+from app.schema.stock_schema import DecreaseItem  # noqa: E402
+from app.service.stock_service import check_stock_availability, decrease_stock  # noqa: E402
+
+CATALOGUE_SIZE = 1000
+THREADS = 8
+DURATION = 3.0
+WRITE_RATIO = 0.2
+
+
+def p99(samples: list[float]) -> float:
+    if not samples:
+        return 0.0
+    samples.sort()
+    return samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000
+
+
+def run(profile: str) -> dict:
+    writer, reader = create_engines(f"sqlite:///{DB_DIR}/{profile}.db", profile)
+    Base.metadata.create_all(bind=writer)
+    factory = sessionmaker(class_=RoutingSession, writer=writer, reader=reader, autoflush=False, bind=writer)
+    with factory() as db:
+        db.add_all(StockItem(category="bench", name=f"item-{i}", amount=10_000_000) for i in range(CATALOGUE_SIZE))
+        db.commit()
+
+    reads: list[float] = []
+    writes: list[float] = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + DURATION
+
+    def worker(seed: int):
+        nonlocal errors
+        rng = random.Random(seed)
+        local_reads, local_writes, local_errors = [], [], 0
+        while time.perf_counter() < deadline:
+            item_id = rng.randint(1, CATALOGUE_SIZE)
+            is_write = rng.random() < WRITE_RATIO
+            start = time.perf_counter()
+            try:
+                with factory() as db:
+                    if is_write:
+                        decrease_stock([DecreaseItem(id=item_id, amount=1)], db)
+                    else:
+                        check_stock_availability([CheckItem(id=item_id, amount=1)], db)
+            except OperationalError:
+                local_errors += 1
+                continue
+            (local_writes if is_write else local_reads).append(time.perf_counter() - start)
+        with lock:
+            reads.extend(local_reads)
+            writes.extend(local_writes)
+            errors += local_errors
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.dispose()
+    if reader is not None:
+        reader.dispose()
+    return {
+        "ops_s": (len(reads) + len(writes)) / DURATION,
+        "read_p99": p99(reads),
+        "write_p99": p99(writes),
+        "errors": errors,
+    }
+
+
+def main():
+    print(f"{THREADS} threads, {DURATION:.0f}s, {WRITE_RATIO:.0%} writes")
+    print(f"{'profile':>10} | {'ops/s':>8} | {'read p99':>9} | {'write p99':>9} | {'locked':>6}   (ms)")
+    for profile in ("plain", "production"):
+        r = run(profile)
+        print(f"{profile:>10} | {r['ops_s']:>8.0f} | {r['read_p99']:>9.2f} | {r['write_p99']:>9.2f} | {r['errors']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Benchmark: per-line vs set-based stock queries.
+
+Compares the old one-SELECT-per-line implementation of check_stock_availability
+and decrease_stock with the current set-based one for 1, 10 and 100 line orders.
+
+Run from the stock-service directory:
+    python bench/stock_queries_bench.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+DB_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_DIR}/bench.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config.database import Base, SessionLocal, engine  # noqa: E402
+from app.model.stock_model import StockItem  # noqa: E402
+from app.schema.stock_check_schema import CheckItem, MissingItem  # noqa: E402
+from app.schema.stock_schema import DecreaseItem  # noqa: E402
+from app.service.stock_service import check_stock_availability, decrease_stock  # noqa: E402
+
+CATALOGUE_SIZE = 1000
+ORDER_SIZES = (1, 10, 100)
+ROUNDS = 200
+
+
+def legacy_check(items, db):
+    missing = []
+    for req_item in items:
+        stock = db.query(StockItem).filter(StockItem.id == req_item.id).first()
+        if not stock or stock.amount < req_item.amount:
+            missing.append(MissingItem(
+                id=req_item.id,
+                requested=req_item.amount,
+                available=stock.amount if stock else 0
+            ))
+    return missing
+
+
+def legacy_decrease(items, db):
+    for req_item in items:
+        stock = db.query(StockItem).filter(StockItem.id == req_item.id).first()
+        if stock and stock.amount >= req_item.amount:
+            stock.amount -= req_item.amount
+    db.commit()
+
+
+def seed():
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.add_all(
+            StockItem(category="bench", name=f"item-{i}", amount=10_000_000)
+            for i in range(CATALOGUE_SIZE)
+        )
+        db.commit()
+
+
+def timed(fn, items) -> float:
+    """Average milliseconds per call, each call in a fresh session."""
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        with SessionLocal() as db:
+            fn(items, db)
+    return (time.perf_counter() - start) * 1000 / ROUNDS
+
+
+def main():
+    seed()
+    print(f"{'lines':>5} | {'check old':>10} | {'check new':>10} | {'decr old':>10} | {'decr new':>10}   (ms/call)")
+    for size in ORDER_SIZES:
+        check_items = [CheckItem(id=i + 1, amount=1) for i in range(size)]
+        decrease_items = [DecreaseItem(id=i + 1, amount=1) for i in range(size)]
+        row = (
+            timed(legacy_check, check_items),
+            timed(check_stock_availability, check_items),
+            timed(legacy_decrease, decrease_items),
+            timed(decrease_stock, decrease_items),
+        )
+        print(f"{size:>5} | " + " | ".join(f"{v:>10.3f}" for v in row))
+
+
+if __name__ == "__main__":
+    main()
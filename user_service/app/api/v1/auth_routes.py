@@ -8,8 +8,8 @@ from app.service.auth_service import login_user, logout_user
 router = APIRouter(prefix="/user", tags=["auth"])
 
 @router.post("/login")
-def login(body: LoginBody, response: Response, db: Session = Depends(get_db)):
-    return login_user(body.username, body.password, response, db)
+async def login(body: LoginBody, response: Response, db: Session = Depends(get_db)):
+    return await login_user(body.username, body.password, response, db)
 
 @router.post("/logout")
 def logout(response: Response):
@@ -1,27 +1,41 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app.schemas.user_schema import UserCreate, UserRead, UserUpdate
+from app.schemas.user_schema import UserCreate, UserPage, UserRead, UserUpdate
 from app.config.database import get_db
-from app.service.user_service import create_user, get_user_by_username, get_all_users, delete_user, update_user
+from app.service.user_service import (
+    create_user, get_user_by_username, get_all_users, delete_user, update_user, stream_all_users
+)
 
 router = APIRouter()
 
+NDJSON = "application/x-ndjson"
+
 @router.post("/user/add", response_model=UserRead)
-def create_user_route(user: UserCreate, db: Session = Depends(get_db)):
-    return create_user(user, db)
+async def create_user_route(user: UserCreate, db: Session = Depends(get_db)):
+    return await create_user(user, db)
 
 @router.get("/user/getone", response_model=UserRead)
 def get_user_route(username: str, db: Session = Depends(get_db)):
     return get_user_by_username(username, db)
 
-@router.get("/user/getall", response_model=list[UserRead])
-def get_all_users_route(db: Session = Depends(get_db)):
-    return get_all_users(db)
+@router.get("/user/getall", response_model=UserPage, response_model_exclude_unset=True)
+def get_all_users_route(
+    request: Request,
+    limit: int = Query(100, ge=1, le=1000),
+    after_id: int | None = Query(None),
+    fields: str | None = Query(None, description="Comma separated: id, username, created_at, updated_at"),
+    db: Session = Depends(get_db)
+):
+    # Accept: application/x-ndjson -> stream every user after after_id instead of one page (exports)
+    if NDJSON in request.headers.get("accept", ""):
+        return StreamingResponse(stream_all_users(fields, after_id), media_type=NDJSON)
+    return get_all_users(db, limit, after_id, fields)
 
 @router.delete("/user/delete")
 def delete_user_route(username: str, db: Session = Depends(get_db)):
     return delete_user(username, db)
 
 @router.put("/user/update/{id}",response_model=UserRead)
-def update_user_route(id: int, user: UserUpdate, db: Session = Depends(get_db)):
-    return update_user(id, user, db)
+async def update_user_route(id: int, user: UserUpdate, db: Session = Depends(get_db)):
+    return await update_user(id, user, db)
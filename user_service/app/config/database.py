@@ -1,17 +1,18 @@
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 from dotenv import load_dotenv
+from app.config.sqlite_profile import CheckpointTask, RoutingSession, create_engines
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./db/default.db")
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+# engine is the (single) writer, reader_engine the read pool; reader_engine is None with SQLITE_PROFILE=plain
+engine, reader_engine = create_engines(DATABASE_URL)
+SessionLocal = sessionmaker(
+    class_=RoutingSession, writer=engine, reader=reader_engine, autocommit=False, autoflush=False, bind=engine
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+checkpoint_task = CheckpointTask(engine) if reader_engine is not None else None
 Base = declarative_base()
 
 def get_db():
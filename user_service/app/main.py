@@ -1,18 +1,36 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.config.database import Base, engine
+from app.config.database import Base, checkpoint_task, engine
 from app.api.v1 import user_routes, auth_routes
 from app.middleware.logger_middleware import logger_middleware
 from app.middleware.auth_middleware import AuthMiddleware
+from app.utils.password_hasher import password_hasher
+from app.utils.token_cache import token_cache
+
+# DB init
+Base.metadata.create_all(bind=engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # periodic WAL checkpoint, only with the production SQLite profile
+    if checkpoint_task is not None:
+        checkpoint_task.start()
+    # KDF worker processes, hashing never runs on the event loop
+    password_hasher.start()
+    yield
+    password_hasher.stop()
+    if checkpoint_task is not None:
+        checkpoint_task.stop()
+
 
 app = FastAPI(
     title="User Service API",
     description="A simple user management service",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# DB init
-Base.metadata.create_all(bind=engine)
-
 # Middleware
 app.middleware("http")(logger_middleware)
 app.add_middleware(AuthMiddleware)
@@ -22,6 +40,11 @@ app.add_middleware(AuthMiddleware)
 def healthz():
     return {"status": "ok"}
 
+# Cache and hasher counters for monitoring
+@app.get("/metrics")
+def metrics():
+    return {"token_cache": token_cache.stats(), "password_hasher": password_hasher.stats()}
+
 # Root (len info)
 @app.get("/")
 def root():
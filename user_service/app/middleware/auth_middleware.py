@@ -1,6 +1,5 @@
-from fastapi import Request
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
 from app.utils.auth_tokens import decode_access_token
 
 EXCLUDED_PATHS = {
@@ -9,23 +8,47 @@ EXCLUDED_PATHS = {
     "/api/v1/user/add": {"POST"},
     "/api/v1/user/logout": {"POST"},
     "/healthz": {"GET"},
+    "/metrics": {"GET"},
 }
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        path = request.url.path
-        method = request.method
+COOKIE_NAME = b"access_token"
 
-        if path in EXCLUDED_PATHS and method in EXCLUDED_PATHS[path]:
-            return await call_next(request)
 
-        token = request.cookies.get("access_token")
+def _cookie(headers: list[tuple[bytes, bytes]], name: bytes) -> str | None:
+    """Value of one cookie straight from the raw Cookie headers, without parsing the rest."""
+    for key, value in headers:
+        if key != b"cookie":
+            continue
+        for chunk in value.split(b";"):
+            cookie_name, sep, cookie_value = chunk.partition(b"=")
+            if sep and cookie_name.strip() == name:
+                return cookie_value.strip().strip(b'"').decode("latin-1") or None
+    return None
+
+
+class AuthMiddleware:
+    """Pure ASGI auth check: no request/response wrapping, streaming bodies pass through untouched.
+    The verified username is put in scope["state"], handlers read it as request.state.username.
+    """
+
+    def __init__(self, app: ASGIApp, excluded_paths: dict[str, set[str]] = EXCLUDED_PATHS):
+        self.app = app
+        self.public = frozenset((path, method) for path, methods in excluded_paths.items() for method in methods)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or (scope["path"], scope["method"]) in self.public:
+            await self.app(scope, receive, send)
+            return
+
+        token = _cookie(scope["headers"], COOKIE_NAME)
         if not token:
-            return JSONResponse(status_code=401, content={"detail": "Missing token"})
+            await JSONResponse(status_code=401, content={"detail": "Missing token"})(scope, receive, send)
+            return
 
         username = decode_access_token(token)
         if not username:
-            return JSONResponse(status_code=401, content={"detail": "Invalid or expired token"})
+            await JSONResponse(status_code=401, content={"detail": "Invalid or expired token"})(scope, receive, send)
+            return
 
-        request.state.username = username
-        return await call_next(request)
+        scope.setdefault("state", {})["username"] = username
+        await self.app(scope, receive, send)
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class UserBase(BaseModel):
     username: str
@@ -17,6 +17,18 @@ class UserRead(UserBase):
     created_at: datetime
     updated_at: datetime
     
+# len stĺpce vybrané cez fields=, ostatné v odpovedi chýbajú
+class UserFields(BaseModel):
+    id: Optional[int] = None
+    username: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class UserPage(BaseModel):
+    items: List[UserFields]
+    # id posledného riadku, pošli ako after_id pre ďalšiu stránku; None = posledná stránka
+    next_after_id: Optional[int] = None
+
 class LoginBody(BaseModel):
     username: str
     password: str    
@@ -1,19 +1,31 @@
 from fastapi import HTTPException, Response
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from app.models.user_model import User
 from app.utils.auth_tokens import create_access_token
+from app.utils.password_hasher import needs_rehash, password_hasher
 
 COOKIE_NAME = "access_token"
 COOKIE_PATH = "/"
 SAMESITE = "lax"
 
-def login_user(username: str, password: str, response: Response, db: Session):
-    """Login a user and set a cookie with the access token."""
-    user = db.query(User).filter(User.username == username).first()
-    if not user or not user.check_password(password):
+def _find_user(username: str, db: Session):
+    return db.query(User).filter(User.username == username).first()
+
+async def login_user(username: str, password: str, response: Response, db: Session):
+    """Login a user and set a cookie with the access token.
+    Legacy SHA-256 hashes and hashes with outdated cost parameters are replaced on success."""
+    user = await run_in_threadpool(_find_user, username, db)
+    valid = await password_hasher.verify(password, user.hashed_password if user else None)
+    if not user or not valid:
         raise HTTPException(status_code=401, detail="Incorrect username or password")
 
-    token = create_access_token(user.username, user.id)
+    user_id, username = user.id, user.username
+    if needs_rehash(user.hashed_password):
+        user.hashed_password = await password_hasher.hash(password)
+        await run_in_threadpool(db.commit)
+
+    token = create_access_token(username, user_id)
     response.set_cookie(
         key=COOKIE_NAME,
         value=token,
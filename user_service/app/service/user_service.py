@@ -1,12 +1,28 @@
+import json
+from datetime import datetime
+from typing import Iterator
 from fastapi import Depends, HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from app.schemas.user_schema import UserCreate, UserUpdate
 from app.models.user_model import User
-from app.config.database import get_db
-import hashlib
+from app.config.database import SessionLocal, get_db
+from app.utils.password_hasher import password_hasher
 
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
+# columns a client may ask for with fields=, hashed_password is never one of them
+USER_FIELDS = ("id", "username", "created_at", "updated_at")
+STREAM_BATCH_SIZE = 1000
+
+def _save_user(db_user: User, db: Session):
+    db.add(db_user)
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+async def create_user(user: UserCreate, db: Session = Depends(get_db)):
     """Create a new user in the database.
+    The password is hashed in the hasher's process pool, database work runs in the threadpool.
     Args:
         user (UserCreate): The user data to create.
         db (Session, optional): The database session. Defaults to Depends(get_db).
@@ -15,16 +31,12 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
     Returns:
         User: The created user object.
     """
-    existing_user = db.query(User).filter(User.username == user.username).first()
+    existing_user = await run_in_threadpool(get_user_by_username, user.username, db)
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already exists")
 
-    hashed = hashlib.sha256(user.password.encode()).hexdigest()
-    db_user = User(username=user.username, hashed_password=hashed)
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+    hashed = await password_hasher.hash(user.password)
+    return await run_in_threadpool(_save_user, User(username=user.username, hashed_password=hashed), db)
 
 def get_user_by_username(username: str, db: Session = Depends(get_db)):
     """Retrieve a user by username.
@@ -36,14 +48,59 @@ def get_user_by_username(username: str, db: Session = Depends(get_db)):
     """
     return db.query(User).filter(User.username == username).first()
 
-def get_all_users(db: Session = Depends(get_db)):
-    """Retrieve all users from the database.
+def _users_query(fields: str | None = None, after_id: int | None = None):
+    """Selected columns of all users in id order, starting after the given id (keyset pagination).
+    Plain column rows, no ORM objects are built.
+    Raises:
+        HTTPException: If fields names an unknown column.
+    """
+    names = USER_FIELDS
+    if fields:
+        names = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+        unknown = [name for name in names if name not in USER_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        if "id" not in names:
+            # the cursor needs it
+            names = ("id", *names)
+    query = select(*(User.__table__.c[name] for name in names)).order_by(User.id)
+    if after_id is not None:
+        query = query.where(User.id > after_id)
+    return query
+
+def get_all_users(
+    db: Session = Depends(get_db), limit: int = 100, after_id: int | None = None, fields: str | None = None
+):
+    """Retrieve one page of users from the database.
     Args:
         db (Session, optional): The database session. Defaults to Depends(get_db).
+        limit (int): Maximum number of users on the page.
+        after_id (int | None): Return users with an id greater than this one.
+        fields (str | None): Comma separated columns to return, all public columns if None. id is always included.
+    Raises:
+        HTTPException: If fields names an unknown column.
     Returns:
-        List[User]: A list of all user objects.
+        dict: The page "items" (dicts of the selected columns) and "next_after_id", which is None on the last page.
     """
-    return db.query(User).all()
+    rows = db.execute(_users_query(fields, after_id).limit(limit + 1)).mappings().all()
+    next_after_id = rows[limit - 1]["id"] if len(rows) > limit else None
+    return {"items": [dict(row) for row in rows[:limit]], "next_after_id": next_after_id}
+
+def stream_all_users(fields: str | None = None, after_id: int | None = None) -> Iterator[str]:
+    """Stream all users after after_id as NDJSON lines, reading STREAM_BATCH_SIZE rows at a time.
+    Build the query (and fail on bad fields) before the response starts; the generator opens
+    its own session so it outlives the request scope.
+    """
+    query = _users_query(fields, after_id).execution_options(yield_per=STREAM_BATCH_SIZE)
+
+    def lines():
+        encode = json.JSONEncoder(default=datetime.isoformat).encode
+        with SessionLocal() as session:
+            result = session.execute(query)
+            keys = list(result.keys())
+            for partition in result.partitions():
+                yield "".join(encode(dict(zip(keys, row))) + "\n" for row in partition)
+    return lines()
 
 def delete_user(username: str, db: Session = Depends(get_db)):
     """Delete a user by username.
@@ -62,8 +119,9 @@ def delete_user(username: str, db: Session = Depends(get_db)):
     return {"detail": "User deleted successfully"}
 
 
-def update_user(id: int, user: UserUpdate, db: Session = Depends(get_db)):
+async def update_user(id: int, user: UserUpdate, db: Session = Depends(get_db)):
     """Update a user by id.
+    A new password is hashed in the hasher's process pool, database work runs in the threadpool.
     Args:
         id (int): The id of the user to update.
         user (UserUpdate): The updated user data with optional username and/or password.
@@ -73,7 +131,7 @@ def update_user(id: int, user: UserUpdate, db: Session = Depends(get_db)):
     Returns:
         User: The updated user object.
     """
-    existing_user = db.query(User).filter(User.id == id).first()
+    existing_user = await run_in_threadpool(db.get, User, id)
     if not existing_user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -83,8 +141,6 @@ def update_user(id: int, user: UserUpdate, db: Session = Depends(get_db)):
 
     # Update password if provided
     if user.password is not None:
-        existing_user.hashed_password = hashlib.sha256(user.password.encode()).hexdigest()#type: ignore
+        existing_user.hashed_password = await password_hasher.hash(user.password) #type: ignore
 
-    db.commit()
-    db.refresh(existing_user)
-    return existing_user
\ No newline at end of file
+    return await run_in_threadpool(_save_user, existing_user, db)
@@ -2,6 +2,7 @@ import os
 import jwt
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
+from app.utils.token_cache import token_cache
 
 load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "12345")
@@ -17,9 +18,16 @@ def create_access_token(username: str, user_id: int, expires: timedelta = timede
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
 def decode_access_token(token: str) -> str | None:
-    """Decode an access token and return the username if valid."""    
+    """Decode an access token and return the username if valid.
+    Verified tokens are served from the token cache until they expire."""
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload.get("sub")
     except (jwt.ExpiredSignatureError, jwt.InvalidTokenError):
         return None
+    username = payload.get("sub")
+    if username:
+        token_cache.put(token, username, payload.get("exp"))
+    return username
@@ -0,0 +1,173 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException
+
+# "scrypt" or "pbkdf2", new hashes use this, existing ones are verified with whatever they were made with
+PASSWORD_KDF = os.getenv("PASSWORD_KDF", "scrypt")
+SCRYPT_N = int(os.getenv("SCRYPT_N", "16384"))
+SCRYPT_R = int(os.getenv("SCRYPT_R", "8"))
+SCRYPT_P = int(os.getenv("SCRYPT_P", "1"))
+PBKDF2_ITERATIONS = int(os.getenv("PBKDF2_ITERATIONS", "600000"))
+# processes per app process, with several gunicorn workers every one of them gets its own pool
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+# hashes queued or running at once, above that logins get 503 instead of piling up
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", str(HASH_WORKERS * 16)))
+
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode().rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=KEY_BYTES)
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations, KEY_BYTES)
+
+
+def _prefix() -> str:
+    """Algorithm and cost parameters of new hashes, e.g. "scrypt$16384$8$1"."""
+    if PASSWORD_KDF == "pbkdf2":
+        return f"pbkdf2_sha256${PBKDF2_ITERATIONS}"
+    if PASSWORD_KDF == "scrypt":
+        return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}"
+    raise ValueError(f"Unknown PASSWORD_KDF {PASSWORD_KDF!r}")
+
+
+def is_legacy(hashed_password: str) -> bool:
+    """Unsalted SHA-256 hex digests stored before the KDF was introduced."""
+    return len(hashed_password) == 64 and "$" not in hashed_password
+
+
+def hash_password(password: str) -> str:
+    """Method to hash a password with the configured KDF.
+
+    Args:
+        password (str): The plain password.
+
+    Returns:
+        str: "scrypt$n$r$p$salt$key" or "pbkdf2_sha256$iterations$salt$key".
+    """
+    prefix = _prefix()
+    salt = secrets.token_bytes(SALT_BYTES)
+    if PASSWORD_KDF == "pbkdf2":
+        key = _pbkdf2(password, salt, PBKDF2_ITERATIONS)
+    else:
+        key = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"{prefix}${_b64(salt)}${_b64(key)}"
+
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    """Method to check a password against any stored hash, legacy SHA-256 included.
+
+    Args:
+        password (str): The plain password.
+        hashed_password (str): The stored hash.
+
+    Returns:
+        bool: True if the password is correct, False otherwise (also for malformed hashes).
+    """
+    if is_legacy(hashed_password):
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), hashed_password)
+    parts = hashed_password.split("$")
+    try:
+        if parts[0] == "scrypt" and len(parts) == 6:
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            key = _scrypt(password, _unb64(parts[4]), n, r, p)
+        elif parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+            key = _pbkdf2(password, _unb64(parts[2]), int(parts[1]))
+        else:
+            return False
+        expected = _unb64(parts[-1])
+    except ValueError:
+        return False
+    return hmac.compare_digest(key, expected)
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True for legacy hashes and for hashes made with another KDF or other cost parameters."""
+    return not hashed_password.startswith(_prefix() + "$")
+
+
+class PasswordHasher:
+    """Runs the KDF in a bounded process pool so hashing neither blocks the event loop
+    nor holds the GIL. Before start() (tests, scripts) the work runs inline.
+
+    At most ``max_pending`` hashes may be queued or running, further calls are shed
+    with 503 right away: a login that would wait seconds for a worker is better retried.
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = HASH_MAX_PENDING):
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self._pool: ProcessPoolExecutor | None = None
+        self._dummy: str | None = None
+        self.pending = 0
+        self.completed = 0
+        self.shed = 0
+
+    def start(self) -> None:
+        if self._pool is None:
+            # spawn, not fork: the app process already runs threads (DB pool, checkpoints)
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def stop(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.shed += 1
+            raise HTTPException(status_code=503, detail="Password hashing is overloaded, retry later", headers={"Retry-After": "1"})
+        self.pending += 1
+        try:
+            if self._pool is None:
+                return fn(*args)
+            return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, password: str, hashed_password: str | None) -> bool:
+        """Check a password. For a missing user pass None: a dummy hash with the current
+        parameters is checked instead, so unknown usernames cost as much as wrong passwords."""
+        if hashed_password is None:
+            if self._dummy is None:
+                self._dummy = await self.hash(secrets.token_hex(16))
+            await self._run(verify_password, password, self._dummy)
+            return False
+        if is_legacy(hashed_password):
+            # a single SHA-256, not worth a round trip to the pool
+            return verify_password(password, hashed_password)
+        return await self._run(verify_password, password, hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            "kdf": _prefix(),
+            "workers": self.workers if self._pool is not None else 0,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "shed": self.shed,
+        }
+
+
+password_hasher = PasswordHasher()
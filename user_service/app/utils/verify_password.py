@@ -1,13 +1,15 @@
-import hashlib
+from app.utils import password_hasher
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Method to verify a password.
-    
+
+    Runs the KDF inline, request handlers await ``password_hasher.verify`` instead.
+
     Args:
         plain_password (str): The plain password.
-        hashed_password (str): The hashed password.
-    
+        hashed_password (str): The hashed password (KDF or legacy SHA-256).
+
     Returns:
         bool: True if the password is correct, False otherwise.
     """
-    return hashlib.sha256(plain_password.encode()).hexdigest() == hashed_password
+    return password_hasher.verify_password(plain_password, hashed_password)
@@ -0,0 +1,109 @@
+"""Benchmark: BaseHTTPMiddleware auth check vs the pure ASGI AuthMiddleware.
+
+Calls a small FastAPI app straight through its ASGI interface, no sockets, so only the
+framework and middleware cost is measured. The "before" middleware is the previous
+BaseHTTPMiddleware implementation, copied here. Scenarios: an authenticated request with
+a valid cookie (token cache warm), a public path and a request without a token.
+
+Run from the user_service directory:
+    python bench/auth_middleware_bench.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+from app.middleware.auth_middleware import EXCLUDED_PATHS, AuthMiddleware  # noqa: E402
+from app.utils.auth_tokens import create_access_token, decode_access_token  # noqa: E402
+
+REQUESTS = 20_000
+
+
+class BaseHTTPAuthMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        path = request.url.path
+        method = request.method
+
+        if path in EXCLUDED_PATHS and method in EXCLUDED_PATHS[path]:
+            return await call_next(request)
+
+        token = request.cookies.get("access_token")
+        if not token:
+            return JSONResponse(status_code=401, content={"detail": "Missing token"})
+
+        username = decode_access_token(token)
+        if not username:
+            return JSONResponse(status_code=401, content={"detail": "Invalid or expired token"})
+
+        request.state.username = username
+        return await call_next(request)
+
+
+def make_app(middleware) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(middleware)
+
+    @app.get("/healthz")
+    async def healthz():
+        return {"status": "ok"}
+
+    @app.get("/api/v1/user/whoami")
+    async def whoami(request: Request):
+        return {"username": request.state.username}
+
+    return app
+
+
+def scope(path: str, cookie: bytes | None) -> dict:
+    headers = [(b"host", b"bench"), (b"user-agent", b"bench")]
+    if cookie:
+        headers.append((b"cookie", b"theme=dark; access_token=" + cookie))
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": headers, "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+
+
+async def run(app: FastAPI, path: str, cookie: bytes | None) -> tuple[float, int]:
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    for _ in range(200):
+        await app(scope(path, cookie), receive, send)
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        await app(scope(path, cookie), receive, send)
+    return REQUESTS / (time.perf_counter() - start), status
+
+
+async def main():
+    token = create_access_token("bench", 1).encode()
+    scenarios = (
+        ("valid cookie", "/api/v1/user/whoami", token),
+        ("public path", "/healthz", None),
+        ("missing token", "/api/v1/user/whoami", None),
+    )
+    apps = (("BaseHTTP", make_app(BaseHTTPAuthMiddleware)), ("pure ASGI", make_app(AuthMiddleware)))
+    print(f"{REQUESTS} in-process requests per row")
+    print(f"{'scenario':>14} | {'middleware':>10} | {'req/s':>8} | {'status':>6}")
+    for label, path, cookie in scenarios:
+        for name, app in apps:
+            rate, status = await run(app, path, cookie)
+            print(f"{label:>14} | {name:>10} | {rate:>8.0f} | {status:>6}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""Benchmark: /user/getall as a full ORM list vs keyset pages, fields= projection and NDJSON export.
+
+Loads USERS users, then times the old endpoint body (every row as an ORM object, serialized
+through UserRead), one page with all public columns, one page with fields=id,username, walking
+every page, and the NDJSON export of the whole table.
+
+Run from the user_service directory:
+    python bench/getall_bench.py [users]
+"""
+import os
+import sys
+import tempfile
+import time
+
+DB_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_DIR}/bench.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+from app.config.database import Base, SessionLocal, engine  # noqa: E402
+from app.models.user_model import User  # noqa: E402
+from app.schemas.user_schema import UserPage, UserRead  # noqa: E402
+from app.service.user_service import get_all_users, stream_all_users  # noqa: E402
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+PAGE = 100
+ROUNDS = 20
+
+
+def seed():
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        for offset in range(0, USERS, 50_000):
+            db.execute(insert(User), [
+                {"username": f"user-{i}", "hashed_password": "x" * 64} for i in range(offset, min(USERS, offset + 50_000))
+            ])
+            db.commit()
+
+
+def timed(fn, rounds: int = ROUNDS) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def old_getall() -> bytes:
+    with SessionLocal() as db:
+        users = db.query(User).all()
+        return TypeAdapter(list[UserRead]).dump_json([UserRead.model_validate(u, from_attributes=True) for u in users])
+
+
+def page(fields: str | None = None, after_id: int | None = None) -> dict:
+    with SessionLocal() as db:
+        result = get_all_users(db, PAGE, after_id, fields)
+        UserPage.model_validate(result).model_dump_json(exclude_unset=True)
+        return result
+
+
+def walk_pages() -> int:
+    pages, after_id = 0, None
+    while True:
+        after_id = page("id,username", after_id)["next_after_id"]
+        pages += 1
+        if after_id is None:
+            return pages
+
+
+def export() -> int:
+    return sum(chunk.count("\n") for chunk in stream_all_users("id,username"))
+
+
+def main():
+    seed()
+    deep = USERS - PAGE * 2
+    print(f"{USERS} users, pages of {PAGE}")
+    print(f"{'request':>36} | {'ms':>9}")
+    print(f"{'old: all rows as ORM + UserRead':>36} | {timed(old_getall, 2):>9.1f}")
+    print(f"{'first page, all fields':>36} | {timed(page):>9.2f}")
+    print(f"{'first page, fields=id,username':>36} | {timed(lambda: page('id,username')):>9.2f}")
+    print(f"{'deep page (after_id), all fields':>36} | {timed(lambda: page(None, deep)):>9.2f}")
+    print(f"{'walk every page, fields=id,username':>36} | {timed(walk_pages, 1):>9.1f}")
+    print(f"{'NDJSON export, fields=id,username':>36} | {timed(export, 2):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
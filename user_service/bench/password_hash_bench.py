@@ -0,0 +1,109 @@
+"""Benchmark: password hashing cost, login verify throughput per core and event loop stalls.
+
+First times one verify per KDF inline (legacy SHA-256, scrypt and PBKDF2 with the configured
+cost), which is the login ceiling of one core. Then runs CONCURRENCY coroutines calling
+password_hasher.verify for DURATION seconds, once inline on the event loop and once through
+the process pool, while a ticker coroutine records how late the loop wakes it up: inline
+hashing stalls every other request, the pool keeps the loop free. The last run floods a
+pool with a small HASH_MAX_PENDING and counts shed (503) calls.
+
+Run from the user_service directory:
+    python bench/password_hash_bench.py
+"""
+import asyncio
+import hashlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException  # noqa: E402
+from app.utils import password_hasher as ph  # noqa: E402
+from app.utils.password_hasher import PasswordHasher, hash_password, verify_password  # noqa: E402
+
+CONCURRENCY = 32
+DURATION = 3.0
+TICK = 0.005
+OVERLOAD_PENDING = 4
+
+
+def p99(samples: list[float]) -> float:
+    if not samples:
+        return 0.0
+    samples.sort()
+    return samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000
+
+
+def per_core(label: str, hashed: str) -> None:
+    rounds, start = 0, time.perf_counter()
+    while time.perf_counter() - start < 1.0:
+        verify_password("secret", hashed)
+        rounds += 1
+    elapsed = time.perf_counter() - start
+    print(f"{label:>22} | {rounds / elapsed:>10.1f} | {elapsed / rounds * 1000:>8.2f}")
+
+
+async def run(hasher: PasswordHasher, hashed: str) -> dict:
+    latencies: list[float] = []
+    lags: list[float] = []
+    shed = 0
+    deadline = time.perf_counter() + DURATION
+
+    async def ticker():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append(time.perf_counter() - start - TICK)
+
+    async def login():
+        nonlocal shed
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                await hasher.verify("secret", hashed)
+            except HTTPException:
+                shed += 1
+                await asyncio.sleep(0.01)
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(ticker(), *(login() for _ in range(CONCURRENCY)))
+    elapsed = time.perf_counter() - started
+    return {"ops_s": len(latencies) / elapsed, "p99": p99(latencies), "lag": max(lags, default=0.0) * 1000, "shed": shed}
+
+
+async def main():
+    cores = os.cpu_count() or 1
+    print(f"one core, one verify at a time ({cores} cores available)")
+    print(f"{'kdf':>22} | {'verify/s':>10} | {'ms':>8}")
+    per_core("legacy sha256", hashlib.sha256(b"secret").hexdigest())
+    scrypt_hash = hash_password("secret")
+    per_core(scrypt_hash.rsplit("$", 2)[0], scrypt_hash)
+    ph.PASSWORD_KDF = "pbkdf2"
+    per_core(f"pbkdf2_sha256${ph.PBKDF2_ITERATIONS}", hash_password("secret"))
+    ph.PASSWORD_KDF = "scrypt"
+
+    print(f"\n{CONCURRENCY} concurrent logins, {DURATION:.0f}s, scrypt")
+    print(f"{'mode':>22} | {'logins/s':>10} | {'per core':>8} | {'p99 ms':>8} | {'max loop lag ms':>15} | {'shed':>5}")
+    modes = [("inline on the loop", PasswordHasher(workers=1, max_pending=CONCURRENCY), False, 1)]
+    modes += [(f"pool, {n} workers", PasswordHasher(workers=n, max_pending=CONCURRENCY), True, n) for n in sorted({1, cores})]
+    modes += [(f"pool, max pending {OVERLOAD_PENDING}", PasswordHasher(workers=cores, max_pending=OVERLOAD_PENDING), True, cores)]
+    for label, hasher, pooled, workers in modes:
+        if pooled:
+            hasher.start()
+            # spawn the workers before timing
+            await asyncio.gather(*(hasher.verify("secret", scrypt_hash) for _ in range(workers)))
+        try:
+            r = await run(hasher, scrypt_hash)
+        finally:
+            hasher.stop()
+        print(
+            f"{label:>22} | {r['ops_s']:>10.1f} | {r['ops_s'] / min(workers, cores):>8.1f} | {r['p99']:>8.1f} | "
+            f"{r['lag']:>15.1f} | {r['shed']:>5}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
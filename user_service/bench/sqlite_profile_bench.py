@@ -0,0 +1,109 @@
+"""Benchmark: plain vs production SQLite profile under a mixed read/write load.
+
+Runs THREADS workers for DURATION seconds against a fresh database file per profile.
+Each operation is a get_user_by_username (read) or, with WRITE_RATIO probability,
+a password change (write) that stores a random hash, so the KDF does not drown out the database. Reports throughput, read/write p99 and "database is locked" errors.
+
+Run from the user_service directory:
+    python bench/sqlite_profile_bench.py
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+DB_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_DIR}/import.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app.config.database import Base  # noqa: E402
+from app.config.sqlite_profile import RoutingSession, create_engines  # noqa: E402
+from app.models.user_model import User  # noqa: E402
+from app.service.user_service import get_user_by_username  # noqa: E402
+
+USERS = 1000
+THREADS = 8
+DURATION = 3.0
+WRITE_RATIO = 0.2
+
+
+def p99(samples: list[float]) -> float:
+    if not samples:
+        return 0.0
+    samples.sort()
+    return samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000
+
+
+def change_password(user_id: int, rng: random.Random, db) -> None:
+    user = db.get(User, user_id)
+    user.hashed_password = f"{rng.getrandbits(256):064x}"
+    db.commit()
+
+
+def run(profile: str) -> dict:
+    writer, reader = create_engines(f"sqlite:///{DB_DIR}/{profile}.db", profile)
+    Base.metadata.create_all(bind=writer)
+    factory = sessionmaker(class_=RoutingSession, writer=writer, reader=reader, autoflush=False, bind=writer)
+    with factory() as db:
+        db.add_all(User(username=f"user-{i}", hashed_password="x" * 64) for i in range(1, USERS + 1))
+        db.commit()
+
+    reads: list[float] = []
+    writes: list[float] = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + DURATION
+
+    def worker(seed: int):
+        nonlocal errors
+        rng = random.Random(seed)
+        local_reads, local_writes, local_errors = [], [], 0
+        while time.perf_counter() < deadline:
+            user_id = rng.randint(1, USERS)
+            is_write = rng.random() < WRITE_RATIO
+            start = time.perf_counter()
+            try:
+                with factory() as db:
+                    if is_write:
+                        change_password(user_id, rng, db)
+                    else:
+                        get_user_by_username(f"user-{user_id}", db)
+            except OperationalError:
+                local_errors += 1
+                continue
+            (local_writes if is_write else local_reads).append(time.perf_counter() - start)
+        with lock:
+            reads.extend(local_reads)
+            writes.extend(local_writes)
+            errors += local_errors
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.dispose()
+    if reader is not None:
+        reader.dispose()
+    return {
+        "ops_s": (len(reads) + len(writes)) / DURATION,
+        "read_p99": p99(reads),
+        "write_p99": p99(writes),
+        "errors": errors,
+    }
+
+
+def main():
+    print(f"{THREADS} threads, {DURATION:.0f}s, {WRITE_RATIO:.0%} writes")
+    print(f"{'profile':>10} | {'ops/s':>8} | {'read p99':>9} | {'write p99':>9} | {'locked':>6}   (ms)")
+    for profile in ("plain", "production"):
+        r = run(profile)
+        print(f"{profile:>10} | {r['ops_s']:>8.0f} | {r['read_p99']:>9.2f} | {r['write_p99']:>9.2f} | {r['errors']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,11 @@ from sqlalchemy.pool import StaticPool
 # Import your real model base & User
 from app.models.user_model import Base, User  # Base should be your DeclarativeBase
 
+@pytest.fixture(scope="session")
+def anyio_backend():
+    # async services run on asyncio under FastAPI
+    return "asyncio"
+
 @pytest.fixture(scope="session")
 def engine():
     # In-memory SQLite that persists for the whole test session
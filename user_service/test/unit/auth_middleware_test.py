@@ -0,0 +1,72 @@
+# tests/unit/auth_middleware_test.py
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from app.middleware.auth_middleware import AuthMiddleware, _cookie
+from app.utils.auth_tokens import create_access_token
+
+def make_client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(AuthMiddleware)
+
+    @app.get("/healthz")
+    def healthz():
+        return {"status": "ok"}
+
+    @app.post("/api/v1/user/login")
+    def login():
+        return {"message": "public"}
+
+    @app.get("/api/v1/user/login")
+    def login_get():
+        return {"message": "not public"}
+
+    @app.get("/api/v1/user/whoami")
+    def whoami(request: Request):
+        return {"username": request.state.username}
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b"a", b"b", b"c"]))
+
+    return TestClient(app)
+
+# _cookie
+def test_cookie_parses_raw_headers():
+    headers = [(b"host", b"x"), (b"cookie", b"theme=dark; access_token=abc.def ; other=1")]
+    assert _cookie(headers, b"access_token") == "abc.def"
+    assert _cookie(headers, b"missing") is None
+    assert _cookie([(b"cookie", b"a=1"), (b"cookie", b'access_token="q"')], b"access_token") == "q"
+    assert _cookie([(b"cookie", b"access_token=")], b"access_token") is None
+
+# AuthMiddleware
+def test_excluded_path_and_method_skip_auth():
+    client = make_client()
+    assert client.get("/healthz").status_code == 200
+    assert client.post("/api/v1/user/login").status_code == 200
+    # same path, method not excluded
+    assert client.get("/api/v1/user/login").status_code == 401
+
+def test_missing_and_invalid_token_are_401():
+    client = make_client()
+    res = client.get("/api/v1/user/whoami")
+    assert res.status_code == 401
+    assert res.json()["detail"] == "Missing token"
+    client.cookies.set("access_token", "not-a-jwt")
+    res = client.get("/api/v1/user/whoami")
+    assert res.status_code == 401
+    assert res.json()["detail"] == "Invalid or expired token"
+
+def test_valid_token_sets_request_state():
+    client = make_client()
+    client.cookies.set("access_token", create_access_token("ana", 1))
+    res = client.get("/api/v1/user/whoami")
+    assert res.status_code == 200
+    assert res.json() == {"username": "ana"}
+
+def test_streaming_response_passes_through():
+    client = make_client()
+    client.cookies.set("access_token", create_access_token("ana", 1))
+    res = client.get("/stream")
+    assert res.status_code == 200
+    assert res.content == b"abc"
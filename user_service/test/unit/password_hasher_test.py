@@ -0,0 +1,72 @@
+# tests/unit/password_hasher_test.py
+import hashlib
+import pytest
+from fastapi import HTTPException
+from app.utils import password_hasher as ph
+from app.utils.password_hasher import PasswordHasher, hash_password, needs_rehash, verify_password
+
+# hash_password / verify_password
+def test_scrypt_hash_roundtrip_and_salted():
+    first = hash_password("secret")
+    second = hash_password("secret")
+    assert first.startswith(f"scrypt${ph.SCRYPT_N}${ph.SCRYPT_R}${ph.SCRYPT_P}$")
+    assert first != second
+    assert verify_password("secret", first) is True
+    assert verify_password("wrong", first) is False
+
+def test_pbkdf2_hash_roundtrip(monkeypatch):
+    monkeypatch.setattr(ph, "PASSWORD_KDF", "pbkdf2")
+    monkeypatch.setattr(ph, "PBKDF2_ITERATIONS", 1000)
+    hashed = hash_password("secret")
+    assert hashed.startswith("pbkdf2_sha256$1000$")
+    assert verify_password("secret", hashed) is True
+    assert verify_password("wrong", hashed) is False
+
+def test_verify_legacy_sha256():
+    legacy = hashlib.sha256("secret".encode()).hexdigest()
+    assert verify_password("secret", legacy) is True
+    assert verify_password("wrong", legacy) is False
+
+def test_verify_malformed_hash_is_false():
+    assert verify_password("secret", "") is False
+    assert verify_password("secret", "scrypt$abc$8$1$salt$key") is False
+    assert verify_password("secret", "md5$whatever") is False
+
+# needs_rehash
+def test_needs_rehash_on_legacy_and_changed_parameters(monkeypatch):
+    hashed = hash_password("secret")
+    assert needs_rehash(hashed) is False
+    assert needs_rehash(hashlib.sha256("secret".encode()).hexdigest()) is True
+    monkeypatch.setattr(ph, "SCRYPT_N", ph.SCRYPT_N * 2)
+    assert needs_rehash(hashed) is True
+    # old parameters still verify
+    assert verify_password("secret", hashed) is True
+
+# PasswordHasher
+@pytest.mark.anyio
+async def test_hasher_verify_unknown_user_is_false():
+    hasher = PasswordHasher(workers=1, max_pending=4)
+    assert await hasher.verify("secret", None) is False
+    assert hasher.stats()["completed"] == 2
+
+@pytest.mark.anyio
+async def test_hasher_sheds_load_over_max_pending():
+    hasher = PasswordHasher(workers=1, max_pending=0)
+    with pytest.raises(HTTPException) as ex:
+        await hasher.hash("secret")
+    assert ex.value.status_code == 503
+    assert ex.value.headers["Retry-After"] == "1"
+    assert hasher.stats()["shed"] == 1
+
+@pytest.mark.anyio
+async def test_hasher_process_pool():
+    hasher = PasswordHasher(workers=1, max_pending=4)
+    hasher.start()
+    try:
+        hashed = await hasher.hash("secret")
+        assert await hasher.verify("secret", hashed) is True
+        assert await hasher.verify("wrong", hashed) is False
+        assert hasher.stats()["workers"] == 1
+    finally:
+        hasher.stop()
+    assert hasher.stats()["pending"] == 0
@@ -0,0 +1,38 @@
+# tests/unit/sqlite_profile_test.py
+import ast
+from pathlib import Path
+import pytest
+
+ROOT = Path(__file__).resolve().parents[3]
+SOURCE = ROOT / "user_service" / "app" / "config" / "sqlite_profile.py"
+STOCK_COPY = ROOT / "stock-service" / "app" / "config" / "sqlite_profile.py"
+ORDER_COPY = ROOT / "order_service" / "app" / "config" / "sqlite_profile.py"
+
+# parts of the profile that do not depend on sync vs async engines
+SHARED = {"is_file_sqlite", "apply_pragmas", "RoutingSession", "_reset_write_routing"}
+
+def shared_parts(path: Path) -> list[str]:
+    """Settings assignments and the engine independent definitions of one copy, as source.
+    Docstrings are left out, the async variant explains how it is wired in them.
+    """
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)) and ast.get_docstring(node) is not None:
+            node.body = node.body[1:]
+    return [
+        ast.unparse(node)
+        for node in tree.body
+        if isinstance(node, ast.Assign) or getattr(node, "name", None) in SHARED
+    ]
+
+def test_stock_copy_is_identical():
+    if not STOCK_COPY.exists():
+        pytest.skip("stock-service is not checked out next to user_service")
+    assert STOCK_COPY.read_bytes() == SOURCE.read_bytes()
+
+def test_order_copy_shares_settings_pragmas_and_routing():
+    if not ORDER_COPY.exists():
+        pytest.skip("order_service is not checked out next to user_service")
+    source = shared_parts(SOURCE)
+    assert len(source) > len(SHARED)
+    assert shared_parts(ORDER_COPY) == source
@@ -0,0 +1,67 @@
+# tests/unit/token_cache_test.py
+import time
+from datetime import timedelta
+import jwt
+from app.utils import auth_tokens
+from app.utils.auth_tokens import create_access_token, decode_access_token
+from app.utils.token_cache import TokenCache, token_cache
+
+# TokenCache
+def test_token_cache_hit_and_miss_counters():
+    cache = TokenCache(maxsize=10)
+    assert cache.get("tok") is None
+    cache.put("tok", "ana", time.time() + 60)
+    assert cache.get("tok") == "ana"
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size"] == 1
+
+def test_token_cache_drops_entry_at_exp():
+    cache = TokenCache(maxsize=10)
+    cache.put("tok", "ana", time.time() + 0.2)
+    assert cache.get("tok") == "ana"
+    time.sleep(0.3)
+    assert cache.get("tok") is None
+    assert cache.stats()["expired"] == 1
+    assert cache.stats()["size"] == 0
+
+def test_token_cache_skips_tokens_without_exp():
+    cache = TokenCache(maxsize=10)
+    cache.put("tok", "ana", None)
+    assert cache.get("tok") is None
+
+def test_token_cache_evicts_least_recently_used():
+    cache = TokenCache(maxsize=2)
+    exp = time.time() + 60
+    cache.put("a", "A", exp)
+    cache.put("b", "B", exp)
+    cache.get("a")
+    cache.put("c", "C", exp)
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+    assert cache.stats()["evicted"] == 1
+
+# decode_access_token
+def test_decode_access_token_uses_cache(monkeypatch):
+    token_cache.clear()
+    token = create_access_token("cached", 1)
+    assert decode_access_token(token) == "cached"
+
+    def fail_decode(*args, **kwargs):
+        raise AssertionError("jwt.decode should not run on a cache hit")
+
+    monkeypatch.setattr(auth_tokens.jwt, "decode", fail_decode)
+    assert decode_access_token(token) == "cached"
+
+def test_decode_access_token_does_not_cache_invalid_tokens():
+    token_cache.clear()
+    token = jwt.encode({"sub": "x"}, "wrong-secret", algorithm="HS256")
+    assert decode_access_token(token) is None
+    assert token_cache.stats()["size"] == 0
+
+def test_decode_access_token_rejects_expired_token():
+    token_cache.clear()
+    token = create_access_token("old", 1, expires=timedelta(seconds=-1))
+    assert decode_access_token(token) is None
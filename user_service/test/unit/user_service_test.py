@@ -1,5 +1,6 @@
 # tests/unit/test_user_service.py
 import hashlib
+import json
 import time
 import pytest
 from starlette.responses import Response
@@ -11,23 +12,28 @@ from app.service.user_service import (
     get_all_users,
     delete_user,
     update_user,
+    stream_all_users,
 )
 from app.schemas.user_schema import UserCreate, UserUpdate, UserRead
 from app.models.user_model import User
+from app.utils.password_hasher import needs_rehash
 
 # create_user
-def test_create_user_creates_and_hashes_password(db):
+@pytest.mark.anyio
+async def test_create_user_creates_and_hashes_password(db):
     data = UserCreate(username="ana", password="secret")
-    u = create_user(data, db=db)
+    u = await create_user(data, db=db)
     assert isinstance(u, User)
     assert u.username == "ana"
     assert u.hashed_password != "secret"
-    assert u.hashed_password == hashlib.sha256("secret".encode()).hexdigest()
+    assert u.hashed_password.startswith("scrypt$")
+    assert u.check_password("secret") is True
 
-def test_create_user_duplicate_raises(db, user_factory):
+@pytest.mark.anyio
+async def test_create_user_duplicate_raises(db, user_factory):
     user_factory("john", "pw")
     with pytest.raises(HTTPException) as ex:
-        create_user(UserCreate(username="john", password="x"), db=db)
+        await create_user(UserCreate(username="john", password="x"), db=db)
     assert ex.value.status_code == 400
     assert "exists" in ex.value.detail.lower()
 
@@ -38,12 +44,39 @@ def test_get_user_by_username_returns_user(db, user_factory):
     assert found is not None
     assert found.username == "mila"
 
-def test_get_all_users_returns_list(db, user_factory):
+def test_get_all_users_returns_page(db, user_factory):
     user_factory("a", "1")
     user_factory("b", "2")
-    users = get_all_users(db=db)
-    assert isinstance(users, list)
-    assert {u.username for u in users} >= {"a", "b"}
+    page = get_all_users(db=db)
+    assert isinstance(page["items"], list)
+    assert {u["username"] for u in page["items"]} >= {"a", "b"}
+    assert page["next_after_id"] is None
+    assert "hashed_password" not in page["items"][0]
+
+def test_get_all_users_keyset_pagination(db, user_factory):
+    ids = [user_factory(f"page{i}", "pw").id for i in range(5)]
+    first = get_all_users(db=db, limit=2, after_id=ids[0] - 1)
+    assert [u["id"] for u in first["items"]] == ids[:2]
+    assert first["next_after_id"] == ids[1]
+    rest = get_all_users(db=db, limit=3, after_id=first["next_after_id"])
+    assert [u["id"] for u in rest["items"]] == ids[2:]
+    assert rest["next_after_id"] is None
+
+def test_get_all_users_fields_projection(db, user_factory):
+    user_factory("proj", "pw")
+    page = get_all_users(db=db, fields="username")
+    assert set(page["items"][0]) == {"id", "username"}
+    with pytest.raises(HTTPException) as ex:
+        get_all_users(db=db, fields="username,hashed_password")
+    assert ex.value.status_code == 400
+
+def test_stream_all_users_ndjson(monkeypatch, db, user_factory):
+    user_factory("s1", "pw")
+    user_factory("s2", "pw")
+    monkeypatch.setattr("app.service.user_service.SessionLocal", lambda: db)
+    rows = [json.loads(line) for line in "".join(stream_all_users("username,created_at")).splitlines()]
+    assert [row["username"] for row in rows] == ["s1", "s2"]
+    assert set(rows[0]) == {"id", "username", "created_at"}
 
 # delete_user
 def test_delete_user_deletes_existing(db, user_factory):
@@ -58,23 +91,27 @@ def test_delete_user_missing_raises_404(db):
     assert ex.value.status_code == 404
 
 # update_user
-def test_update_user_updates_username_and_password(db, user_factory):
+@pytest.mark.anyio
+async def test_update_user_updates_username_and_password(db, user_factory):
     u = user_factory("oldname", "oldpw")
-    updated = update_user(
+    updated = await update_user(
         id=u.id,
         user=UserUpdate(username="newname", password="newpw"),
         db=db,
     )
     assert updated.username == "newname"
-    assert updated.hashed_password == hashlib.sha256("newpw".encode()).hexdigest()
+    assert updated.check_password("newpw") is True
+    assert not needs_rehash(updated.hashed_password)
 
-def test_update_user_missing_raises_404(db):
+@pytest.mark.anyio
+async def test_update_user_missing_raises_404(db):
     with pytest.raises(HTTPException) as ex:
-        update_user(id=9999, user=UserUpdate(username="x"), db=db)
+        await update_user(id=9999, user=UserUpdate(username="x"), db=db)
     assert ex.value.status_code == 404
 
 # auth: login / logout
-def test_login_user_success_sets_cookie_and_returns_message(monkeypatch, db, user_factory):
+@pytest.mark.anyio
+async def test_login_user_success_sets_cookie_and_returns_message(monkeypatch, db, user_factory):
     u = user_factory("cookieuser", "pw123")
     assert u.check_password("pw123") is True
 
@@ -89,20 +126,45 @@ def test_login_user_success_sets_cookie_and_returns_message(monkeypatch, db, use
     )
 
     response = Response()
-    result = login_user(username="cookieuser", password="pw123", response=response, db=db)
+    result = await login_user(username="cookieuser", password="pw123", response=response, db=db)
 
     cookies = response.headers.get("set-cookie", "")
     assert "access_token=FAKE-TOKEN" in cookies
     assert "; HttpOnly" in cookies
     assert result["message"] == "Login successful"
 
-def test_login_user_wrong_credentials_raise_401(db, user_factory):
+@pytest.mark.anyio
+async def test_login_user_wrong_credentials_raise_401(db, user_factory):
     user_factory("bob", "rightpw")
     response = Response()
     with pytest.raises(HTTPException) as ex:
-        login_user(username="bob", password="wrongpw", response=response, db=db)
+        await login_user(username="bob", password="wrongpw", response=response, db=db)
+    assert ex.value.status_code == 401
+
+@pytest.mark.anyio
+async def test_login_user_unknown_username_raise_401(db):
+    with pytest.raises(HTTPException) as ex:
+        await login_user(username="nobody", password="pw", response=Response(), db=db)
     assert ex.value.status_code == 401
 
+@pytest.mark.anyio
+async def test_login_user_rehashes_legacy_password(db, user_factory):
+    u = user_factory("legacy", "oldpw")
+    legacy_hash = u.hashed_password
+    assert needs_rehash(legacy_hash)
+
+    await login_user(username="legacy", password="oldpw", response=Response(), db=db)
+    db.refresh(u)
+    assert u.hashed_password != legacy_hash
+    assert not needs_rehash(u.hashed_password)
+    assert u.check_password("oldpw") is True
+
+    # the new hash keeps working, and is not rewritten again
+    rehashed = u.hashed_password
+    await login_user(username="legacy", password="oldpw", response=Response(), db=db)
+    db.refresh(u)
+    assert u.hashed_password == rehashed
+
 def test_logout_user_deletes_cookie():
     response = Response()
     res = logout_user(response)